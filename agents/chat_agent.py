@@ -6,13 +6,380 @@ including command recognition, tool calling, and tool chaining.
 import os
 import sys
 import asyncio
-from typing import Dict, List, Optional, Any, Callable, Union
+import hashlib
+import logging
+import time
+import traceback
+import weakref
+from collections import OrderedDict, deque
+from itertools import islice
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Callable, Tuple, Union
 import anthropic
-import json
+from anthropic.types import RawContentBlockDeltaEvent, RawContentBlockStopEvent, TextDelta
+from anthropic.lib.streaming import InputJsonEvent
 import re
 
 from config import Config
+from managers.semantic_cache_manager import SemanticCacheManager
 from utils.terminal_utils import print_status, print_colored
+from utils.json_utils import dumps, dumps_sorted, try_loads
+
+# Beta header enabling Anthropic prompt caching (cache_control breakpoints)
+PROMPT_CACHING_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+# Tools that change files or the working directory; they never run alongside other tools
+STATEFUL_TOOLS = frozenset({
+    "set_working_directory", "write_file", "generate_code", "modify_code", "apply_changes"
+})
+
+# Parameters identifying the tool when a tool_use block names an unregistered one,
+# checked in order; a block matches when it has at least these parameters
+TOOL_SIGNATURES = (
+    (frozenset({"path", "content"}), "write_file"),
+    (frozenset({"filepath", "code"}), "generate_code"),
+    (frozenset({"filepath", "analysis_type"}), "analyze_code"),
+    (frozenset({"filepath", "original_code", "new_code"}), "modify_code"),
+    (frozenset({"original", "modified"}), "generate_diff"),
+    (frozenset({"filepath", "changes"}), "apply_changes"),
+)
+
+# A read_file path with one of these prefixes that does not look like a file may be a directory
+ABSOLUTE_PATH_PREFIXES = ("/", "C:", "D:")
+
+# Paths ending in a common source or text file extension are taken to be files without a stat
+FILE_PATH_PATTERN = re.compile(
+    r'[^/\\]+\.(?:py|pyi|txt|md|json|csv|toml|yaml|yml|ini|cfg|ts|tsx|js|jsx|go|rs|c|cc|cpp|h|hpp)$',
+    re.IGNORECASE
+)
+
+# Read-only tools whose results are cached: tool name -> TTL in seconds, or None to
+# keep the result until the file it reads changes
+CACHEABLE_TOOLS = {"read_file": None, "analyze_code": None, "list_directory": 5.0, "find_files": 5.0}
+
+# Tool results longer than this (as compact JSON) are not pretty-printed in debug output
+TOOL_RESULT_PRETTY_MAX = 4096
+
+def _diff_input_from_string(text: str) -> Optional[Dict[str, Any]]:
+    """Split an "original:modified" string into generate_diff parameters."""
+    parts = text.split(":")
+    if len(parts) == 2:
+        return {"original": parts[0], "modified": parts[1]}
+    return None
+
+
+# Build a tool's input from a stripped string argument; a None result keeps the string
+STRING_INPUT_ADAPTERS: Dict[str, Callable[[str], Optional[Dict[str, Any]]]] = {
+    "read_file": lambda text: {"path": text},
+    "set_working_directory": lambda text: {"path": text},
+    "generate_diff": _diff_input_from_string,
+    "modify_code": lambda text: {"filepath": text, "original_code": "", "new_code": ""},
+    "generate_code": lambda text: {"filepath": text, "code": ""},
+    "analyze_code": lambda text: {"filepath": text, "analysis_type": "basic"},
+    "parse_diff_suggestions": lambda text: {"suggestion_text": text},
+    "apply_changes": lambda text: {"filepath": text, "changes": []},
+}
+
+# Static part of the /help output; the system information is appended per call
+HELP_TEXT = """
+=== ETMSonnet Assistant ===
+
+Slash Commands:
+  /help - Show this help information
+  /exit - Exit the program
+  /clear - Clear the conversation history
+  /status - Show token usage and session information
+  /debug - Toggle debug mode
+  /tools - Show available tools
+  /history - Show tool call history
+  /history clear - Forget the recorded tool calls
+  /chains - Show information about tool chaining capabilities
+
+Direct Code Commands:
+  code:workdir:/path/to/dir - Set working directory
+  code:read:path/to/file.py - Read a file
+  code:read:file1.py,file2.py - Read multiple files
+  code:find:directory - Find Python files in directory
+  code:find:recursive:directory - Find Python files recursively
+  code:list - Show loaded files
+  code:generate:/path/to/file.py:prompt - Generate code with a prompt
+  code:change:/path/to/file.py:prompt - Modify existing code with prompt
+
+File Commands:
+  You can use natural language to:
+  - Read files: "Please read main.py" or "Show me the contents of config.py"
+  - Find files: "Find all Python files in the directory" or "List files in the src folder"
+  - Set working directory: "Change working directory to /path/to/dir"
+  - List loaded files: "What files are currently loaded?"
+
+Code Analysis Commands:
+  You can ask the assistant to:
+  - Analyze Python files: "Analyze the code in file.py" or "Review the structure of utils.py"
+  - Generate code: "Generate a utility function for parsing JSON" or "Create a class for..."
+  - Modify code: "Change the function in main.py to handle errors better"
+  - Show differences: "What changes would you suggest for this code?"
+
+Tool Chaining:
+  The assistant can now automatically chain multiple tools for complex operations:
+  - "Modify code in file.py" will first read the file, then apply modifications
+  - "Change directory to /path/to/dir" will set directory and then list contents
+  - "Find and read config files" will search for files and read matching results
+
+"""
+
+# Output of /chains
+CHAINING_INFO_TEXT = """Tool Chaining Information:
+
+Automatic Tool Chains:
+1. Directory Navigation Chain
+   - When you set a working directory, automatically lists its contents
+
+2. File Modification Chain
+   - When modifying a file, automatically reads it first if not already read
+
+3. File Search and Read Chain
+   - When finding a single file matching a pattern, automatically reads it
+
+4. Code Analysis Chain
+   - When analyzing code in a file, automatically reads it first
+
+"""
+
+def validate_settings(api_key: str, config: Config) -> None:
+    """
+    Check the API key and model settings before any request is made, so bad
+    settings fail fast instead of costing a round-trip to get a 401/400 back.
+
+    Args:
+        api_key: Anthropic API key
+        config: Application configuration
+
+    Raises:
+        ValueError: If the API key or the model settings are invalid
+    """
+    if not api_key or not api_key.startswith("sk-"):
+        raise ValueError("Missing or invalid Anthropic API key")
+    if not config.model or config.max_response_tokens <= 0:
+        raise ValueError("Config needs a model and a positive max_response_tokens")
+
+
+@lru_cache(maxsize=1)
+def get_shared_client(api_key: str) -> anthropic.AsyncAnthropic:
+    """
+    Get the process-wide Anthropic client so agents share one connection pool.
+
+    Args:
+        api_key: Anthropic API key
+
+    Returns:
+        Shared AsyncAnthropic client
+    """
+    # The SDK only accepts clients built on the HTTP package it bundles, so the
+    # pool limits are created with that package's own Limits class
+    limits_cls = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+    return anthropic.AsyncAnthropic(
+        api_key=api_key,
+        http_client=anthropic.DefaultAsyncHttpxClient(
+            timeout=anthropic.Timeout(60.0, connect=5.0),
+            limits=limits_cls(max_keepalive_connections=64, keepalive_expiry=60)
+        )
+    )
+
+
+class _StreamCoalescer:
+    """
+    Buffers small stream deltas and forwards them to a callback in larger chunks.
+    A flush happens when a delta completes a line, when the buffer reaches
+    max_chars, or max_ms after the first buffered delta, whichever comes first.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str], None]], max_chars: int = 128, max_ms: int = 15):
+        """
+        Initialize the coalescer.
+
+        Args:
+            callback: Callback that receives the coalesced text (None discards it)
+            max_chars: Buffered character count that triggers a flush
+            max_ms: Maximum time in milliseconds text stays buffered
+        """
+        self.callback = callback
+        self.max_chars = max_chars
+        self.max_delay = max_ms / 1000
+        self._buffer: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def feed(self, chunk: str) -> None:
+        """
+        Buffer a chunk of text, flushing at a line end or the size threshold.
+
+        Args:
+            chunk: Text delta from the stream
+        """
+        if self.callback is None:
+            return
+
+        self._buffer.append(chunk)
+        self._size += len(chunk)
+
+        if self._size >= self.max_chars or "\n" in chunk:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self) -> None:
+        """Forward any buffered text to the callback."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            self.callback(text)
+
+    def emit(self, text: str) -> None:
+        """
+        Flush buffered text, then forward text to the callback immediately.
+
+        Args:
+            text: Text to forward without buffering
+        """
+        self.flush()
+        if self.callback is not None:
+            self.callback(text)
+
+
+class _BatchDispatcher:
+    """
+    Groups one-shot requests issued within a short window into a single
+    Message Batches API call and routes each result back to its caller.
+    One dispatcher is shared by all agents using the same client.
+    """
+
+    _instances: "weakref.WeakKeyDictionary[Any, _BatchDispatcher]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def for_client(cls, client, **kwargs) -> "_BatchDispatcher":
+        """
+        Get the dispatcher for a client, creating it on first use.
+
+        Args:
+            client: Anthropic async client
+            **kwargs: Dispatcher settings used when creating it
+
+        Returns:
+            Shared dispatcher for the client
+        """
+        dispatcher = cls._instances.get(client)
+        if dispatcher is None:
+            dispatcher = cls._instances[client] = cls(client, **kwargs)
+        return dispatcher
+
+    def __init__(self, client, window_ms: int = 10, max_batch: int = 16, poll_interval: float = 1.0):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            client: Anthropic async client
+            window_ms: How long to wait for more requests after the first one
+            max_batch: Maximum number of requests per batch
+            poll_interval: Seconds between batch status checks
+        """
+        self.client = client
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: "set[asyncio.Task]" = set()
+
+    async def submit(self, params: Dict[str, Any]):
+        """
+        Queue a request and wait for its result.
+
+        Args:
+            params: Messages API parameters for the request
+
+        Returns:
+            The resulting Message
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((params, future))
+        return await future
+
+    async def close(self):
+        """Stop the worker and cancel in-flight batches."""
+        tasks = list(self._dispatches)
+        if self._worker is not None:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    async def _run(self):
+        """Collect queued requests into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """
+        Send one batch, wait for it to finish and resolve the callers' futures.
+
+        Args:
+            batch: List of (params, future) pairs
+        """
+        futures = {f"request-{i}": future for i, (_, future) in enumerate(batch)}
+        requests = [
+            {"custom_id": custom_id, "params": params}
+            for custom_id, (params, _) in zip(futures, batch)
+        ]
+
+        try:
+            message_batch = await self.client.messages.batches.create(requests=requests)
+            while message_batch.processing_status != "ended":
+                await asyncio.sleep(self.poll_interval)
+                message_batch = await self.client.messages.batches.retrieve(message_batch.id)
+
+            async for entry in await self.client.messages.batches.results(message_batch.id):
+                future = futures.get(entry.custom_id)
+                if future is None or future.done():
+                    continue
+                if entry.result.type == "succeeded":
+                    future.set_result(entry.result.message)
+                else:
+                    future.set_exception(RuntimeError(f"Batch request {entry.result.type}"))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Batch finished without a result for this request"))
 
 
 class ChatAgent:
@@ -21,7 +388,8 @@ class ChatAgent:
     Handles message sending, receiving, streaming, and tool calling.
     """
     
-    def __init__(self, api_key: str, config: Config, conversation_manager, file_manager, debug_mode=True):
+    def __init__(self, api_key: str, config: Config, conversation_manager, file_manager, debug_mode=True,
+                 client: Optional[anthropic.AsyncAnthropic] = None):
         """
         Initialize the chat agent.
         
@@ -31,21 +399,105 @@ class ChatAgent:
             conversation_manager: Manager for conversation history
             file_manager: Manager for file operations
             debug_mode: Whether to print debug information about tool calls
+            client: Optional Anthropic client to use instead of the shared one
+
+        Raises:
+            ValueError: If the API key or the model settings are invalid
         """
-        # Create the client with the API key directly
-        if not api_key:
-            print("Warning: No API key provided to ChatAgent")
+        # main() validates before its connection test; this only guards library use
+        # and callers that inject their own settings
+        validate_settings(api_key, config)
             
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Use the async client so streaming does not block the event loop
+        self.client = client if client is not None else get_shared_client(api_key)
         self.config = config
         self.conversation_manager = conversation_manager
         self.file_manager = file_manager
         self.tools = []
         self.tool_handlers = {}
+        self._tools_digest = b""
+        self._formatted_tools: Optional[List[Dict[str, Any]]] = None
+        self._tools_text: Optional[str] = None  # Rendered /tools output
+        self._base_kwargs: MappingProxyType = MappingProxyType({})
+        self._base_kwargs_key: Optional[Tuple[str, int]] = None
+        self._thinking_params: Dict[int, MappingProxyType] = {}  # budget -> thinking param
+        self._system_blocks: Tuple[Optional[str], Optional[List[Dict[str, Any]]]] = (None, None)
         self.debug_mode = debug_mode
-        self.tool_call_history = []
+        self._log = logging.getLogger(__name__)
+        self.tool_call_history: "deque[Dict[str, Any]]" = deque(maxlen=config.tool_history_max)
+        self._tool_call_count = 0  # Total tool calls this session, including evicted history
         self.pending_tool_chains = []  # Track pending tool chains
-        
+        self._bg_tasks: "set[asyncio.Task]" = set()  # Background history updates
+        self._seen_tracebacks: "set[str]" = set()  # Debug tracebacks already printed this turn
+
+        # Slash command name -> handler
+        self._commands = {
+            'help': self._show_help_command,
+            'exit': self._cmd_exit,
+            'clear': self._cmd_clear,
+            'status': self._show_status_command,
+            'debug': self._cmd_debug,
+            'tools': self._show_tools_command,
+            'history': self._show_tool_history,
+            'history clear': self._cmd_clear_history,
+            'chains': self._show_chaining_info,
+        }
+        self.cache_stats = {"cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+        self._response_cache: "OrderedDict[bytes, str]" = OrderedDict()  # Exact-match LRU
+        self._tool_cache: "OrderedDict[Tuple, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()  # Tool result LRU
+        self._fmt_cache = {"version": -1, "system": None, "formatted": []}  # Formatted history
+        self.semantic_cache = (
+            SemanticCacheManager(
+                threshold=config.semantic_cache_threshold,
+                max_entries=config.semantic_cache_size
+            )
+            if config.semantic_cache_enabled else None
+        )
+        self._batcher = (
+            _BatchDispatcher.for_client(
+                self.client,
+                window_ms=config.batch_window_ms,
+                max_batch=config.batch_max_size,
+                poll_interval=config.batch_poll_interval
+            )
+            if config.batch_requests_enabled else None
+        )
+
+    async def aclose(self):
+        """
+        Wait for background work and stop the batch dispatcher. The Anthropic
+        client is shared with other agents, so closing it is left to its owner.
+        """
+        await self.drain()
+        if self._batcher:
+            await self._batcher.close()
+
+    def _append_assistant_message(self, content: str):
+        """
+        Add an assistant message to the conversation in the background, so the
+        reply is returned without waiting for tokenization.
+
+        Args:
+            content: Assistant response text
+        """
+        task = asyncio.create_task(
+            asyncio.to_thread(self.conversation_manager.add_message, "assistant", content)
+        )
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+
+    async def drain(self):
+        """
+        Wait for pending background history updates to finish. Call this before
+        writing to the conversation history from outside the agent, so the last
+        reply is recorded before anything that follows it.
+        """
+        if self._bg_tasks:
+            results = await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    self._log.error("Error updating conversation history: %s", result, exc_info=result)
+
     def register_tools(self, tools, tool_handlers):
         """
         Register tools with the chat agent.
@@ -56,6 +508,14 @@ class ChatAgent:
         """
         self.tools = tools
         self.tool_handlers = tool_handlers
+        self._formatted_tools = [tool.to_dict() for tool in tools] if tools else None
+        if self._formatted_tools:
+            # Tools lead the prompt, so a breakpoint on the last one caches all definitions;
+            # it is added to a copy because to_dict() results are shared between agents
+            self._formatted_tools[-1] = {**self._formatted_tools[-1], "cache_control": EPHEMERAL_CACHE}
+        # The listing only depends on the registered tools, so render it once here
+        self._tools_text = self._render_tools_text()
+        self._tools_digest = hashlib.blake2b(dumps_sorted(self._formatted_tools or [])).digest()
 
         if self.debug_mode:
             print(f"Registered {len(tools)} tools:")
@@ -84,23 +544,56 @@ class ChatAgent:
         Returns:
             Claude's response (None if using streaming)
         """
+        # Keep history ordered: the previous reply must be recorded before this message
+        await self.drain()
+        self._seen_tracebacks.clear()
+
         # Add user message to conversation
         self.conversation_manager.add_message("user", message)
 
         try:
-            # Extract system message and regular messages
-            system_message, message_objs = await self.conversation_manager.extract_system_message()
-        
-            # Format messages correctly for the Messages API
-            formatted_messages = self.conversation_manager.format_messages_for_api(message_objs)
-        
-            # Prepare thinking parameters if enabled
-            thinking = {"type": "enabled", "budget_tokens": 16000} if thinking_enabled else None
+            # Extract the system message and format the rest for the Messages API
+            system_message, formatted_messages = await self._get_formatted_history()
+
+            # Prepare tools for API call if we have any
+            formatted_tools = self._formatted_tools
+
+            # Identical requests are answered from the local response cache
+            cache_key = self._response_cache_key(
+                self.conversation_manager.prefix_hash(), thinking_enabled
+            )
+            cached_response = self._get_cached_response(cache_key)
+
+            # Near-duplicate user messages are answered from the semantic cache
+            semantic_vector = None
+            context_hash = None
+            if cached_response is None and self.semantic_cache:
+                context_hash = self.semantic_cache.context_hash(system_message, formatted_messages[:-1])
+                semantic_vector = await asyncio.to_thread(self.semantic_cache.embed, message)
+                cached_response = self.semantic_cache.lookup(semantic_vector, context_hash)
+
+            if cached_response is not None:
+                if self.debug_mode:
+                    print("\n[DEBUG] Response cache hit, skipping API call")
+                if stream_callback:
+                    stream_callback(cached_response)
+                self._append_assistant_message(cached_response)
+                return cached_response if not stream_callback else None
+
+            # Mark the stable prefix (system prompt + history) for server-side prompt caching
+            system_blocks = self._build_cached_system(system_message)
+            formatted_messages = self._apply_cache_breakpoint(formatted_messages)
+
+            # Per-call parameters on top of the shared model settings
+            request_kwargs = {**self._request_base(), "system": system_blocks, "messages": formatted_messages}
+            if formatted_tools:
+                request_kwargs["tools"] = formatted_tools
+            if thinking_enabled:
+                request_kwargs["thinking"] = self._thinking_param(self._thinking_budget(message))
         
             complete_response = ""
-        
-            # Prepare tools for API call if we have any
-            formatted_tools = [tool.to_dict() for tool in self.tools] if self.tools else None
+            response_parts: List[str] = []
+            tools_used = False
         
             if self.debug_mode:
                 print("\n[DEBUG] Sending message to Claude with:")
@@ -109,246 +602,433 @@ class ChatAgent:
                 print(f"[DEBUG] - Message history: {len(formatted_messages)} messages")
                 print(f"[DEBUG] - Tools: {len(formatted_tools) if formatted_tools else 0} tools")
                 if formatted_tools:
-                    print(f"[DEBUG] - First tool: {json.dumps(formatted_tools[0], indent=2)}")
-        
-            # Stream the response if needed
-            if stream_callback:
-                with self.client.messages.stream(
-                    model=self.config.model,
-                    max_tokens=self.config.max_response_tokens,
-                    system=system_message,
-                    messages=formatted_messages,
-                    tools=formatted_tools,
-                    thinking=thinking
+                    print(f"[DEBUG] - First tool: {formatted_tools[0]['name']}")
+        
+            if self._batcher and not stream_callback:
+                # One-shot requests can share a Message Batches call with concurrent ones
+                response = await self._batcher.submit(
+                    {key: value for key, value in request_kwargs.items() if value is not None}
+                )
+                self._record_cache_usage(response)
+                response_parts.append(self._extract_text_from_response(response))
+
+                # Tool calls go through the same executor as streamed ones
+                tool_calls = []
+                for block in (getattr(response, "content", None) or ()):
+                    if getattr(block, "type", None) == "tool_use":
+                        tool_call = await self._tool_call_from_block(block, f"tool-{self._tool_call_count + len(tool_calls)}")
+                        if tool_call is not None:
+                            tool_calls.append(tool_call)
+                if tool_calls:
+                    tools_used = True
+                    await self._run_tool_calls(tool_calls, _StreamCoalescer(None), response_parts)
+
+                complete_response = "".join(response_parts)
+            else:
+                # Stream the response; without a callback the text is only accumulated
+                async with self.client.messages.stream(
+                    **request_kwargs, extra_headers=PROMPT_CACHING_HEADERS
                 ) as stream:
                     tool_calls = []
-                    current_tool_call = None
-                    current_tool_input = ""
-                
-                    if self.debug_mode:
+                    # Tool calls start as soon as their block ends, keyed by position
+                    started_tools: Dict[int, asyncio.Task] = {}
+                    tool_semaphore = asyncio.Semaphore(self.config.max_tool_concurrency)
+                    coalescer = _StreamCoalescer(
+                        stream_callback,
+                        max_chars=self.config.stream_coalesce_chars,
+                        max_ms=self.config.stream_coalesce_ms
+                    )
+                    # The stream only hands tool calls over; a separate task starts them
+                    tool_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+                    tool_consumer = asyncio.create_task(self._consume_tool_calls(
+                        tool_queue, started_tools, response_parts, coalescer, tool_semaphore
+                    ))
+            
+                    # Local references for the per-token hot path
+                    _append = response_parts.append
+                    _feed = coalescer.feed
+                    # Read once per stream; nothing is formatted per event when debug is off
+                    debug = self.debug_mode
+            
+                    if debug:
                         print("[DEBUG] Stream started")
-                
-                    for event in stream:
-                        event_type = getattr(event, 'type', None)
-                        if self.debug_mode and event_type:
-                            print(f"[DEBUG] Event type: {event_type}")
-                        
-                        # Regular content block event
-                        if event_type == "content_block_delta":
-                            if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
-                                chunk_text = event.delta.text
-                                if chunk_text:
-                                    complete_response += chunk_text
-                                    stream_callback(chunk_text)
-                        
-                        # Tool call events handling - now checking for input_json events
-                        elif event_type == "input_json":
-                            if self.debug_mode:
-                                print(f"\n[DEBUG] 🔧 Tool call detected via input_json event")
-                                print(f"[DEBUG] Partial JSON: {getattr(event, 'partial_json', None)}")
-                                print(f"[DEBUG] Snapshot: {getattr(event, 'snapshot', None)}")
-                                
-                            # Only process when we have a non-empty snapshot (meaning the JSON is complete)
-                            if hasattr(event, 'snapshot') and event.snapshot:
-                                snapshot = event.snapshot
-                                
-                                if self.debug_mode:
-                                    print(f"[DEBUG] 📦 Complete snapshot received: {snapshot}")
-                                
-                                # Process the complete tool call
-                                try:
-                                    # Check if snapshot contains tool information
-                                    if isinstance(snapshot, dict):
-                                        # Case 1: We have a name in the snapshot
-                                        if 'name' in snapshot and snapshot.get('name') in self.tool_handlers:
-                                            tool_name = snapshot.get('name')
-                                            tool_input = snapshot.get('input', {})
-                                            tool_id = snapshot.get('id', f"tool-{len(self.tool_call_history)}")
-                                        
-                                        # Case 2: We don't have a name, but need to infer it from parameters
-                                        else:
-                                            # Infer tool based on parameters
-                                            tool_name = None
-                                            tool_input = snapshot
-                                            tool_id = f"tool-{len(self.tool_call_history)}"
-                                            
-                                            # Infer tool based on parameters
-                                            if 'path' in snapshot and len(snapshot) == 1:
-                                                # If only path is provided, check if it's a directory or a file
-                                                path = snapshot['path']
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔍 Inferring tool from path: {path}")
-                                                
-                                                # Try to check if it's a directory
-                                                if os.path.isdir(path):
-                                                    tool_name = 'set_working_directory'
-                                                    if self.debug_mode:
-                                                        print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (path is a directory)")
-                                                elif os.path.isfile(path):
-                                                    tool_name = 'read_file'
-                                                    if self.debug_mode:
-                                                        print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (path is a file)")
-                                                else:
-                                                    # Assume it's a directory change if the path looks like a directory path
-                                                    # (ends with / or doesn't have a file extension)
-                                                    if path.endswith('/') or '.' not in os.path.basename(path):
-                                                        tool_name = 'set_working_directory'
-                                                        if self.debug_mode:
-                                                            print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (path looks like a directory)")
-                                                    else:
-                                                        # Default to read_file for any other path
-                                                        tool_name = 'read_file'
-                                                        if self.debug_mode:
-                                                            print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (default for path parameter)")
-                                            elif 'path' in snapshot and 'content' in snapshot:
-                                                tool_name = 'write_file'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (path and content parameters)")
-                                            elif 'filepath' in snapshot and 'code' in snapshot:
-                                                tool_name = 'generate_code'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (filepath and code parameters)")
-                                            elif 'filepath' in snapshot and 'analysis_type' in snapshot:
-                                                tool_name = 'analyze_code'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (filepath and analysis_type parameters)")
-                                            # New inference cases for code modification tools
-                                            elif 'filepath' in snapshot and 'original_code' in snapshot and 'new_code' in snapshot:
-                                                tool_name = 'modify_code'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (filepath, original_code, and new_code parameters)")
-                                            elif 'original' in snapshot and 'modified' in snapshot:
-                                                tool_name = 'generate_diff'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (original and modified parameters)")
-                                            elif 'suggestion_text' in snapshot and len(snapshot) == 1:
-                                                tool_name = 'parse_diff_suggestions'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (suggestion_text parameter)")
-                                            elif 'filepath' in snapshot and 'changes' in snapshot:
-                                                tool_name = 'apply_changes'
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (filepath and changes parameters)")
-                                        
-                                        # If we have a valid tool name
-                                        if tool_name and tool_name in self.tool_handlers:
-                                            if self.debug_mode:
-                                                print(f"[DEBUG] 🔧 Using tool: {tool_name}")
-                                                print(f"[DEBUG] 📝 Tool input: {tool_input}")
-                                            
-                                            # Create the tool call object
-                                            tool_call = {
-                                                "name": tool_name,
-                                                "input": tool_input,
-                                                "id": tool_id
-                                            }
-                                            
-                                            # Add to tool call history
-                                            self.tool_call_history.append(tool_call)
-                                            
-                                            # Print tool status (regardless of debug mode)
-                                            self.print_tool_status(tool_name, tool_input)
-                                            
-                                            # NEW: Check for potential tool chaining
-                                            next_tool = self._check_for_tool_chain(tool_name, tool_input, complete_response)
-                                            
-                                            # Execute the tool
-                                            if self.debug_mode:
-                                                print(f"[DEBUG] 🛠️ Executing tool: {tool_name}")
-                                                
-                                            result = await self._handle_tool_call(tool_call)
-                                            
-                                            # Add result to response - only show details in debug mode
-                                            if self.debug_mode:
-                                                # In debug mode, show the full tool result
-                                                result_text = f"\n\nTool: {tool_name}\nResult: {json.dumps(result, indent=2)}\n"
-                                            else:
-                                                # In normal mode, just indicate a tool was used
-                                                if 'error' in result:
-                                                    # Show errors even in non-debug mode
-                                                    result_text = f"\n[Tool error: {result['error']}]\n"
-                                                else:
-                                                    # Don't show successful tool results in regular mode
-                                                    result_text = ""
-                                            
-                                            if result_text:
-                                                stream_callback(result_text)
-                                                complete_response += result_text
-                                            
-                                            # NEW: Execute the next tool in the chain if needed
-                                            if next_tool:
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] 🔗 Chaining to next tool: {next_tool['name']}")
-                                                
-                                                next_result = await self._handle_tool_call(next_tool)
-                                                
-                                                # Add chained tool result to response
-                                                if self.debug_mode:
-                                                    chain_result_text = f"\n\nChained Tool: {next_tool['name']}\nResult: {json.dumps(next_result, indent=2)}\n"
-                                                    stream_callback(chain_result_text)
-                                                    complete_response += chain_result_text
-                                            
-                                            # Submit tool output back to Claude
-                                            try:
-                                                # Don't try to submit directly as this SDK version doesn't support it
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] ✅ Tool execution complete, adding result to conversation")
-                                                
-                                                # Add a system message with the tool result for context
-                                                self.conversation_manager.add_message(
-                                                    "system", 
-                                                    f"Tool '{tool_name}' was called with input: {json.dumps(tool_input)} " +
-                                                    f"and returned result: {json.dumps(result)}"
-                                                )
-                                                
-                                                # Add chained tool result to context if applicable
-                                                if next_tool:
-                                                    self.conversation_manager.add_message(
-                                                        "system",
-                                                        f"Chained tool '{next_tool['name']}' was called automatically with input: {json.dumps(next_tool['input'])} " +
-                                                        f"and returned result: {json.dumps(next_result)}"
-                                                    )
-                                            except Exception as e:
-                                                if self.debug_mode:
-                                                    print(f"[DEBUG] ❌ Error handling tool result: {str(e)}")
-                                        else:
-                                            if self.debug_mode:
-                                                print(f"[DEBUG] ⚠️ Could not identify a valid tool for snapshot: {snapshot}")
-                                    else:
-                                        if self.debug_mode:
-                                            print(f"[DEBUG] ⚠️ Snapshot is not a dictionary: {snapshot}")
-                                
-                                except Exception as e:
-                                    if self.debug_mode:
-                                        print(f"[DEBUG] ❌ Error processing tool snapshot: {str(e)}")
-                                        import traceback
-                                        traceback.print_exc()
-            else:
-                # Non-streaming mode
-                response = await self.client.messages.create(
-                    model=self.config.model,
-                    max_tokens=self.config.max_response_tokens,
-                    system=system_message,
-                    messages=formatted_messages,
-                    tools=formatted_tools
-                )
-                
-                # Extract text content
-                complete_response = self._extract_text_from_response(response)
+            
+                    try:
+                        async for event in stream:
+                            event_cls = type(event)
+                            if debug:
+                                print(f"[DEBUG] Event type: {event.type}")
+                    
+                            # Regular content block event
+                            if event_cls is RawContentBlockDeltaEvent:
+                                delta = event.delta
+                                if type(delta) is TextDelta:
+                                    chunk_text = delta.text
+                                    if chunk_text:
+                                        _append(chunk_text)
+                                        _feed(chunk_text)
+                    
+                            # Tool input arrives as partial JSON that the SDK parses incrementally
+                            elif event_cls is InputJsonEvent:
+                                if debug:
+                                    print(f"[DEBUG] Partial tool input JSON: {event.partial_json}")
+                    
+                            # A finished tool_use block carries the tool name and the fully parsed input
+                            elif isinstance(event, RawContentBlockStopEvent) and event.content_block.type == "tool_use":
+                                tool_call = await self._tool_call_from_block(
+                                    event.content_block,
+                                    f"tool-{self._tool_call_count + len(tool_calls)}"
+                                )
+                                if tool_call is not None:
+                                    tool_calls.append(tool_call)
+                                    tool_queue.put_nowait(tool_call)
+
+                        tool_queue.put_nowait(None)
+                        await tool_consumer
+                    except BaseException:
+                        tool_consumer.cancel()
+                        for task in started_tools.values():
+                            task.cancel()
+                        raise
+                    finally:
+                        coalescer.flush()
+
+                    if tool_calls:
+                        tools_used = True
+                        await self._run_tool_calls(tool_calls, coalescer, response_parts, started_tools, tool_semaphore)
+
+                    complete_response = "".join(response_parts)
+                    self._record_cache_usage(await stream.get_final_message())
             
             # Add the complete response to conversation history
             if complete_response:
-                self.conversation_manager.add_message("assistant", complete_response)
+                self._append_assistant_message(complete_response)
+
+                # Turns that ran tools had side effects, so they are never replayed
+                if not tools_used:
+                    self._store_cached_response(cache_key, complete_response)
+                    if self.semantic_cache:
+                        self.semantic_cache.add(semantic_vector, context_hash, complete_response)
         
             return complete_response if not stream_callback else None
         
         except Exception as e:
-            error_msg = f"Error in send_message: {str(e)}"
-            print(error_msg, file=sys.stderr)
-            import traceback
-            traceback.print_exc()
+            self._log.exception("send_message failed: %s", e)
             return f"Error: {str(e)}"
 
+    async def _tool_call_from_block(self, block, fallback_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Turn a finished tool_use block into a tool call, inferring the tool when
+        the block does not name a registered one.
+
+        Args:
+            block: Completed tool_use content block from the stream
+            fallback_id: Tool call ID to use when the tool has to be inferred
+
+        Returns:
+            Tool call dictionary, or None if no valid tool could be identified
+        """
+        snapshot = block.input
+        debug = self.debug_mode
+        if debug:
+            print(f"[DEBUG] 📦 Complete snapshot received: {snapshot}")
+
+        # Process the complete tool call
+        try:
+            # Check if snapshot contains tool information
+            if isinstance(snapshot, dict):
+                # Case 1: The block names a registered tool
+                if block.name in self.tool_handlers:
+                    tool_name = block.name
+                    tool_input = snapshot
+                    tool_id = block.id
+
+                # Case 2: Unknown tool name, infer the tool from its parameters
+                else:
+                    # Infer tool based on parameters
+                    tool_name = None
+                    tool_input = snapshot
+                    tool_id = fallback_id
+
+                    keys = snapshot.keys()
+                    if keys == {'path'}:
+                        # If only path is provided, check if it's a directory or a file
+                        path = snapshot['path']
+                        if debug:
+                            print(f"[DEBUG] 🔍 Inferring tool from path: {path}")
+
+                        # The file system is only checked when the path itself is ambiguous
+                        if FILE_PATH_PATTERN.search(path):
+                            tool_name = 'read_file'
+                            reason = "path looks like a file"
+                        elif path.endswith(('/', '\\')) or await asyncio.to_thread(os.path.isdir, path):
+                            tool_name = 'set_working_directory'
+                            reason = "path is a directory"
+                        elif '.' in os.path.basename(path) or await asyncio.to_thread(os.path.isfile, path):
+                            tool_name = 'read_file'
+                            reason = "path is a file"
+                        else:
+                            # A missing path without an extension is most likely a directory
+                            tool_name = 'set_working_directory'
+                            reason = "path looks like a directory"
+                        if debug:
+                            print(f"[DEBUG] 🔧 Inferred tool: {tool_name} ({reason})")
+                    else:
+                        if keys == {'suggestion_text'}:
+                            tool_name = 'parse_diff_suggestions'
+                        else:
+                            tool_name = next((name for required, name in TOOL_SIGNATURES if keys >= required), None)
+                        if tool_name and debug:
+                            print(f"[DEBUG] 🔧 Inferred tool: {tool_name} (parameters: {', '.join(keys)})")
+
+                # If we have a valid tool name
+                if tool_name and tool_name in self.tool_handlers:
+                    if debug:
+                        print(f"[DEBUG] 🔧 Using tool: {tool_name}")
+                        print(f"[DEBUG] 📝 Tool input: {tool_input}")
+
+                    # Create the tool call object
+                    tool_call = {
+                        "name": tool_name,
+                        "input": tool_input,
+                        "id": tool_id
+                    }
+
+                    # The tools themselves run once the stream has ended
+                    return tool_call
+                else:
+                    if debug:
+                        print(f"[DEBUG] ⚠️ Could not identify a valid tool for snapshot: {snapshot}")
+            else:
+                if debug:
+                    print(f"[DEBUG] ⚠️ Snapshot is not a dictionary: {snapshot}")
+
+        except Exception as e:
+            if debug:
+                print(f"[DEBUG] ❌ Error processing tool snapshot: {str(e)}")
+                self._print_traceback()
+        return None
+
+    def _start_tool_call(self, tool_call: Dict[str, Any], current_response: str,
+                         semaphore: asyncio.Semaphore) -> "asyncio.Task":
+        """
+        Record a tool call and start running it, plus any tool it chains to, as a task.
+
+        Args:
+            tool_call: Tool call to run
+            current_response: Response text so far, used to pick a chained tool
+            semaphore: Semaphore bounding concurrent tool calls
+
+        Returns:
+            Task resolving to (result, next_tool, next_result)
+        """
+        # Add to tool call history
+        self._record_tool_call(tool_call)
+
+        # Print tool status (regardless of debug mode)
+        self.print_tool_status(tool_call["name"], tool_call["input"])
+
+        return asyncio.create_task(self._execute_tool_call(tool_call, current_response, semaphore))
+
+    async def _execute_tool_call(self, tool_call: Dict[str, Any], current_response: str,
+                                 semaphore: asyncio.Semaphore):
+        """
+        Run a tool call and any tool it chains to.
+
+        Args:
+            tool_call: Tool call to run
+            current_response: Response text so far, used to pick a chained tool
+            semaphore: Semaphore bounding concurrent tool calls
+
+        Returns:
+            Tuple of (result, next_tool, next_result)
+        """
+        async with semaphore:
+            # NEW: Check for potential tool chaining
+            next_tool = self._check_for_tool_chain(tool_call["name"], tool_call["input"], current_response)
+
+            if self.debug_mode:
+                print(f"[DEBUG] 🛠️ Executing tool: {tool_call['name']}")
+            result = await self._handle_tool_call(tool_call)
+
+            # NEW: Execute the next tool in the chain if needed
+            next_result = None
+            if next_tool:
+                if self.debug_mode:
+                    print(f"[DEBUG] 🔗 Chaining to next tool: {next_tool['name']}")
+                next_result = await self._handle_tool_call(next_tool)
+
+            return result, next_tool, next_result
+
+    async def _consume_tool_calls(self, queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+                                  started: Dict[int, "asyncio.Task"], response_parts: List[str],
+                                  coalescer: _StreamCoalescer, semaphore: asyncio.Semaphore):
+        """
+        Start tool calls as the stream hands them over, until a None arrives.
+        Independent calls start right away; a stateful tool first waits for the
+        calls before it, and the calls after it wait for it.
+
+        Args:
+            queue: Tool calls in response order, ended by None
+            started: Filled with the task for each call, by position
+            response_parts: Response text so far, used to pick a chained tool
+            coalescer: Stream coalescer, flushed before tool status is printed
+            semaphore: Semaphore bounding concurrent tool calls
+        """
+        pending: List[asyncio.Task] = []
+        index = 0
+        while True:
+            tool_call = await queue.get()
+            if tool_call is None:
+                return
+
+            stateful = tool_call["name"] in STATEFUL_TOOLS
+            if stateful and pending:
+                await asyncio.wait(pending)
+                pending = []
+
+            coalescer.flush()
+            task = self._start_tool_call(tool_call, "".join(response_parts), semaphore)
+            started[index] = task
+            index += 1
+
+            if stateful:
+                await asyncio.wait([task])
+            else:
+                pending.append(task)
+
+    async def _run_tool_calls(self, tool_calls: List[Dict[str, Any]], coalescer: _StreamCoalescer,
+                              response_parts: List[str], started: Optional[Dict[int, "asyncio.Task"]] = None,
+                              semaphore: Optional[asyncio.Semaphore] = None):
+        """
+        Run the tool calls from one response and report their results in order.
+        Independent calls run concurrently (bounded by max_tool_concurrency); a
+        stateful tool waits for the calls before it and runs on its own.
+
+        Args:
+            tool_calls: Tool calls requested in the response
+            coalescer: Stream coalescer used to emit result text
+            response_parts: Response text parts, extended with result text
+            started: Tasks for calls already started while streaming, by position
+            semaphore: Semaphore bounding concurrent tool calls (a new one if None)
+        """
+        current_response = "".join(response_parts)
+        started = started or {}
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.config.max_tool_concurrency)
+
+        # Group consecutive independent calls; stateful tools form a group of their own
+        groups: List[List[int]] = []
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call["name"] in STATEFUL_TOOLS or not groups or tool_calls[groups[-1][-1]]["name"] in STATEFUL_TOOLS:
+                groups.append([index])
+            else:
+                groups[-1].append(index)
+
+        outcomes = []
+        for group in groups:
+            tasks = [
+                started.get(index) or self._start_tool_call(tool_calls[index], current_response, semaphore)
+                for index in group
+            ]
+            outcomes.extend(await asyncio.gather(*tasks, return_exceptions=True))
+
+        for tool_call, outcome in zip(tool_calls, outcomes):
+            tool_name = tool_call["name"]
+            tool_input = tool_call["input"]
+            if isinstance(outcome, Exception):
+                result, next_tool, next_result = {"error": str(outcome)}, None, None
+            else:
+                result, next_tool, next_result = outcome
+
+            # Add result to response - only show details in debug mode
+            if self.debug_mode:
+                # In debug mode, show the full tool result
+                result_text = f"\n\nTool: {tool_name}\nResult: {self._format_tool_result(result)}\n"
+            elif 'error' in result:
+                # Show errors even in non-debug mode
+                result_text = f"\n[Tool error: {result['error']}]\n"
+            else:
+                # Don't show successful tool results in regular mode
+                result_text = ""
+
+            if result_text:
+                coalescer.emit(result_text)
+                response_parts.append(result_text)
+
+            # Add chained tool result to response
+            if next_tool and self.debug_mode:
+                chain_result_text = f"\n\nChained Tool: {next_tool['name']}\nResult: {self._format_tool_result(next_result)}\n"
+                coalescer.emit(chain_result_text)
+                response_parts.append(chain_result_text)
+
+            # Submit tool output back to Claude
+            try:
+                # Don't try to submit directly as this SDK version doesn't support it
+                if self.debug_mode:
+                    print(f"[DEBUG] ✅ Tool execution complete, adding result to conversation")
+
+                # Add a system message with the tool result for context
+                preview_chars = self.config.tool_result_preview_chars
+                self.conversation_manager.add_tool_result(
+                    tool_name, tool_input, self._tool_result_for_history(result), preview_chars
+                )
+
+                # Add chained tool result to context if applicable
+                if next_tool:
+                    self.conversation_manager.add_tool_result(
+                        next_tool['name'], next_tool['input'], self._tool_result_for_history(next_result),
+                        preview_chars, chained=True
+                    )
+            except Exception as e:
+                if self.debug_mode:
+                    print(f"[DEBUG] ❌ Error handling tool result: {str(e)}")
+
+    def _tool_result_for_history(self, result: Any) -> str:
+        """
+        Serialize a tool result for the conversation history, truncating it
+        to Config.tool_result_max_chars when a limit is set.
+
+        Args:
+            result: Tool result
+
+        Returns:
+            Compact JSON text of the result
+        """
+        text = dumps(result)
+        max_chars = self.config.tool_result_max_chars
+        if max_chars > 0 and len(text) > max_chars:
+            return f"{text[:max_chars]}... [truncated {len(text) - max_chars} characters]"
+        return text
+
+    def _format_tool_result(self, result: Any) -> str:
+        """
+        Format a tool result for display in debug mode.
+        Large results (such as file contents) are shown as compact JSON.
+
+        Args:
+            result: Tool result
+
+        Returns:
+            Display text for the result
+        """
+        if isinstance(result, str):
+            return result
+
+        text = dumps(result)
+        if len(text) > TOOL_RESULT_PRETTY_MAX:
+            return text
+        return dumps(result, pretty=True)
+
+    def _print_traceback(self):
+        """Print the current exception's traceback unless it was already printed this turn."""
+        tb_text = traceback.format_exc()
+        if tb_text in self._seen_tracebacks:
+            print("[DEBUG] (same traceback as above)")
+            return
+        self._seen_tracebacks.add(tb_text)
+        sys.stderr.write(tb_text)
+
     def _check_for_tool_chain(self, tool_name: str, tool_input: Dict[str, Any], current_response: str) -> Optional[Dict[str, Any]]:
         """
         Check if a tool call should trigger a chain of tools.
@@ -371,7 +1051,7 @@ class ChatAgent:
             return {
                 "name": "list_directory",
                 "input": {"path": path},
-                "id": f"chain-{len(self.tool_call_history)}"
+                "id": f"chain-{self._tool_call_count}"
             }
             
         # Pattern 2: Reading a file for analysis should be followed by analyze_code (if Python file)
@@ -383,7 +1063,7 @@ class ChatAgent:
                 return {
                     "name": "analyze_code",
                     "input": {"filepath": path, "analysis_type": "basic"},
-                    "id": f"chain-{len(self.tool_call_history)}"
+                    "id": f"chain-{self._tool_call_count}"
                 }
                 
         # Pattern 3: When finding files, if only one match, read it automatically
@@ -418,39 +1098,14 @@ class ChatAgent:
 
         # Ensure tool_input is a dictionary
         if isinstance(tool_input, str):
-            try:
-                tool_input = json.loads(tool_input)
-            except json.JSONDecodeError:
-                # Handle specific tools with string inputs
-                if tool_name == "read_file":
-                    # Try to convert string input to a path parameter
-                    tool_input = {"path": tool_input.strip()}
-                elif tool_name == "set_working_directory":
-                    # Handle direct path inputs for directory changes
-                    tool_input = {"path": tool_input.strip()}
-                # Add other tool-specific string input handling as needed
-                elif tool_name == "generate_diff":
-                    # Handle string input as file path for diff
-                    if ":" in tool_input:
-                        # If format is like "old_file:new_file", split it
-                        parts = tool_input.strip().split(":")
-                        if len(parts) == 2:
-                            tool_input = {"original": parts[0], "modified": parts[1]}
-                elif tool_name == "modify_code":
-                    # Try to convert string input to a filepath parameter
-                    tool_input = {"filepath": tool_input.strip(), "original_code": "", "new_code": ""}
-                elif tool_name == "generate_code":
-                    # Handle string input as filepath
-                    tool_input = {"filepath": tool_input.strip(), "code": ""}
-                elif tool_name == "analyze_code":
-                    # Handle string input as filepath with default analysis type
-                    tool_input = {"filepath": tool_input.strip(), "analysis_type": "basic"}
-                elif tool_name == "parse_diff_suggestions":
-                    # Handle string input as suggestion text
-                    tool_input = {"suggestion_text": tool_input.strip()}
-                elif tool_name == "apply_changes":
-                    # Handle string input as filepath
-                    tool_input = {"filepath": tool_input.strip(), "changes": []}
+            decoded = try_loads(tool_input)
+            if decoded is not None:
+                tool_input = decoded
+            else:
+                # Tools with one main parameter also accept it as a plain string
+                adapter = STRING_INPUT_ADAPTERS.get(tool_name)
+                if adapter is not None:
+                    tool_input = adapter(tool_input.strip()) or tool_input
 
         # NEW: Special handling for chains that require reading before modification
         if tool_name == "modify_code" and isinstance(tool_input, dict) and "filepath" in tool_input:
@@ -485,9 +1140,9 @@ class ChatAgent:
             if self.debug_mode:
                 print(f"[DEBUG] Checking if '{path}' is a misrouted directory command")
         
-            if (path.startswith("/") or path.startswith("C:") or path.startswith("D:")) and not path.endswith((".py", ".txt", ".md", ".json", ".csv")):
+            if path.startswith(ABSOLUTE_PATH_PREFIXES) and not FILE_PATH_PATTERN.search(path):
                 # This looks like a directory path, not a file path
-                if os.path.isdir(path):
+                if await asyncio.to_thread(os.path.isdir, path):
                     if self.debug_mode:
                         print(f"[DEBUG] Detected a directory path sent to read_file: {path}")
                         print(f"[DEBUG] Redirecting to set_working_directory tool")
@@ -543,15 +1198,26 @@ class ChatAgent:
             return {"error": error_msg}
 
         try:
-            # Call the handler with the tool input
-            if self.debug_mode:
-                print(f"[DEBUG] 🛠️ Executing tool: {tool_name}")
-                print(f"[DEBUG] 📝 Tool parameters: {json.dumps(tool_input, indent=2) if isinstance(tool_input, dict) else tool_input}")
+            # Writes may change what read-only tools would return
+            if tool_name in STATEFUL_TOOLS:
+                self._tool_cache.clear()
 
-            result = await handler.handle_tool_use({
-                "name": tool_name,
-                "input": tool_input
-            })
+            tool_cache_key = await self._tool_cache_key(tool_name, tool_input)
+            result = self._get_cached_tool_result(tool_cache_key)
+            if result is not None:
+                if self.debug_mode:
+                    print(f"[DEBUG] ♻️ Reusing cached result for tool: {tool_name}")
+            else:
+                # Call the handler with the tool input
+                if self.debug_mode:
+                    print(f"[DEBUG] 🛠️ Executing tool: {tool_name}")
+                    print(f"[DEBUG] 📝 Tool parameters: {tool_input}")
+
+                result = await handler.handle_tool_use({
+                    "name": tool_name,
+                    "input": tool_input
+                })
+                self._store_cached_tool_result(tool_cache_key, tool_name, result)
             
             # NEW: Check for follow-up tool chaining based on result
             next_tool = self._check_for_follow_up_chain(tool_name, tool_input, result)
@@ -566,8 +1232,9 @@ class ChatAgent:
                 result["chained_tool"] = next_tool["name"]
                 result["chained_result"] = follow_up_result
 
+            # Payloads can be large; they are only formatted in debug mode
             if self.debug_mode:
-                print(f"[DEBUG] 📊 Tool result: {json.dumps(result, indent=2)}")
+                print(f"[DEBUG] 📊 Tool result for {tool_name}: {self._format_tool_result(result)}")
 
             return result
 
@@ -575,8 +1242,7 @@ class ChatAgent:
             error_msg = f"Error handling tool call: {str(e)}"
             if self.debug_mode:
                 print(f"[DEBUG] ❌ {error_msg}")
-                import traceback
-                traceback.print_exc()
+                self._print_traceback()
             return {"error": error_msg}
             
     def _check_for_follow_up_chain(self, tool_name: str, tool_input: Dict[str, Any], tool_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -601,7 +1267,7 @@ class ChatAgent:
                 return {
                     "name": "read_file",
                     "input": {"path": filepath},
-                    "id": f"follow-{len(self.tool_call_history)}"
+                    "id": f"follow-{self._tool_call_count}"
                 }
                 
         # Pattern 2: After successful parse_diff_suggestions, apply the changes
@@ -614,6 +1280,16 @@ class ChatAgent:
                 
         return None
     
+    def _record_tool_call(self, tool_call: Dict[str, Any]):
+        """
+        Add a tool call to the bounded tool call history.
+
+        Args:
+            tool_call: Tool call dictionary with name, input and id
+        """
+        self.tool_call_history.append(tool_call)
+        self._tool_call_count += 1
+
     def _has_recent_read(self, filepath: str) -> bool:
         """
         Check if a file has been read recently in the tool call history.
@@ -626,9 +1302,8 @@ class ChatAgent:
         """
         # Look back through recent tool calls
         max_lookback = 10  # Only look at the last 10 tool calls
-        recent_tools = self.tool_call_history[-max_lookback:] if len(self.tool_call_history) > max_lookback else self.tool_call_history
         
-        for tool_call in reversed(recent_tools):  # Start with most recent
+        for tool_call in islice(reversed(self.tool_call_history), max_lookback):  # Start with most recent
             if tool_call.get('name') == 'read_file':
                 tool_input = tool_call.get('input', {})
                 if isinstance(tool_input, dict) and tool_input.get('path') == filepath:
@@ -651,27 +1326,48 @@ class ChatAgent:
         if self.debug_mode:
             print(f"[DEBUG] 🔍 Processing slash command: /{command}")
 
-        if command == 'help':
-            return await self._show_help_command()
-        elif command == 'exit':
-            print("Exiting...")
-            sys.exit(0)
-        elif command == 'clear':
-            self.conversation_manager.clear()
-            return "Conversation cleared. New session started."
-        elif command == 'status':
-            return await self._show_status_command()
-        elif command == 'debug':
-            self.debug_mode = not self.debug_mode
-            return f"Debug mode {'enabled' if self.debug_mode else 'disabled'}"
-        elif command == 'tools':
-            return self._show_tools_command()
-        elif command == 'history':
-            return self._show_tool_history()
-        elif command == 'chains':  # NEW command to show chaining information
-            return self._show_chaining_info()
-        else:
+        # Commands like /status and /clear should see the latest history
+        await self.drain()
+
+        handler = self._commands.get(command)
+        if handler is None:
             return f"Unknown command: /{command}"
+        return handler()
+
+    def _cmd_exit(self):
+        """Exit the application."""
+        print("Exiting...")
+        sys.exit(0)
+
+    def _cmd_clear(self):
+        """
+        Clear the conversation history.
+
+        Returns:
+            Confirmation message
+        """
+        self.conversation_manager.clear()
+        return "Conversation cleared. New session started."
+
+    def _cmd_clear_history(self):
+        """
+        Clear the tool call history.
+
+        Returns:
+            Confirmation message
+        """
+        self.tool_call_history.clear()
+        return "Tool call history cleared."
+
+    def _cmd_debug(self):
+        """
+        Toggle debug mode.
+
+        Returns:
+            New debug mode state
+        """
+        self.debug_mode = not self.debug_mode
+        return f"Debug mode {'enabled' if self.debug_mode else 'disabled'}"
 
     def _show_tools_command(self):
         """
@@ -680,22 +1376,31 @@ class ChatAgent:
         Returns:
             Tool information
         """
+        return self._tools_text or "No tools registered."
+
+    def _render_tools_text(self) -> Optional[str]:
+        """
+        Render the /tools listing for the registered tools.
+
+        Returns:
+            Tool information, or None if no tools are registered
+        """
         if not self.tools:
-            return "No tools registered."
+            return None
 
-        tools_info = "Available tools:\n\n"
+        parts = ["Available tools:\n\n"]
         for tool in self.tools:
-            tools_info += f"- {tool.name}: {tool.description}\n"
+            parts.append(f"- {tool.name}: {tool.description}\n")
 
             # Show parameters
             if tool.input_schema and 'properties' in tool.input_schema:
-                tools_info += "  Parameters:\n"
+                parts.append("  Parameters:\n")
                 for param_name, param_info in tool.input_schema['properties'].items():
                     required = "required" if ('required' in tool.input_schema and param_name in tool.input_schema['required']) else "optional"
                     default = f" (default: {param_info.get('default')})" if ('default' in param_info) else ""
-                    tools_info += f"    - {param_name}: {param_info.get('description', 'No description')} ({required}){default}\n"
-        tools_info += "\n"
-        return tools_info
+                    parts.append(f"    - {param_name}: {param_info.get('description', 'No description')} ({required}){default}\n")
+        parts.append("\n")
+        return "".join(parts)
     
     def _show_tool_history(self):
         """
@@ -707,12 +1412,14 @@ class ChatAgent:
         if not self.tool_call_history:
             return "No tool calls recorded."
         
-        history_info = "Tool call history:\n\n"
-        for i, tool_call in enumerate(self.tool_call_history):
-            history_info += f"{i+1}. {tool_call['name']}\n"
-            history_info += f"   Parameters: {json.dumps(tool_call['input'], indent=2)}\n\n"
+        parts = ["Tool call history:\n\n"]
+        # Older calls may have been evicted; keep numbering them from the session start
+        first = self._tool_call_count - len(self.tool_call_history)
+        for i, tool_call in enumerate(self.tool_call_history, first):
+            parts.append(f"{i+1}. {tool_call['name']}\n")
+            parts.append(f"   Parameters: {dumps(tool_call['input'], pretty=True)}\n\n")
         
-        return history_info
+        return "".join(parts)
     
     def _show_chaining_info(self):
         """
@@ -721,74 +1428,16 @@ class ChatAgent:
         Returns:
             Tool chaining information
         """
-        chaining_info = "Tool Chaining Information:\n\n"
-        
-        chaining_info += "Automatic Tool Chains:\n"
-        chaining_info += "1. Directory Navigation Chain\n"
-        chaining_info += "   - When you set a working directory, automatically lists its contents\n\n"
-        
-        chaining_info += "2. File Modification Chain\n"
-        chaining_info += "   - When modifying a file, automatically reads it first if not already read\n\n"
-        
-        chaining_info += "3. File Search and Read Chain\n"
-        chaining_info += "   - When finding a single file matching a pattern, automatically reads it\n\n"
-        
-        chaining_info += "4. Code Analysis Chain\n"
-        chaining_info += "   - When analyzing code in a file, automatically reads it first\n\n"
-        
-        return chaining_info
+        return CHAINING_INFO_TEXT
     
-    async def _show_help_command(self):
+    def _show_help_command(self):
         """
         Show help information.
         
         Returns:
             Help message
         """
-        help_text = f"""
-=== ETMSonnet Assistant ===
-
-Slash Commands:
-  /help - Show this help information
-  /exit - Exit the program
-  /clear - Clear the conversation history
-  /status - Show token usage and session information
-  /debug - Toggle debug mode
-  /tools - Show available tools
-  /history - Show tool call history
-  /chains - Show information about tool chaining capabilities
-
-Direct Code Commands:
-  code:workdir:/path/to/dir - Set working directory
-  code:read:path/to/file.py - Read a file
-  code:read:file1.py,file2.py - Read multiple files
-  code:find:directory - Find Python files in directory
-  code:find:recursive:directory - Find Python files recursively
-  code:list - Show loaded files
-  code:generate:/path/to/file.py:prompt - Generate code with a prompt
-  code:change:/path/to/file.py:prompt - Modify existing code with prompt
-
-File Commands:
-  You can use natural language to:
-  - Read files: "Please read main.py" or "Show me the contents of config.py"
-  - Find files: "Find all Python files in the directory" or "List files in the src folder"
-  - Set working directory: "Change working directory to /path/to/dir"
-  - List loaded files: "What files are currently loaded?"
-
-Code Analysis Commands:
-  You can ask the assistant to:
-  - Analyze Python files: "Analyze the code in file.py" or "Review the structure of utils.py"
-  - Generate code: "Generate a utility function for parsing JSON" or "Create a class for..."
-  - Modify code: "Change the function in main.py to handle errors better"
-  - Show differences: "What changes would you suggest for this code?"
-
-Tool Chaining:
-  The assistant can now automatically chain multiple tools for complex operations:
-  - "Modify code in file.py" will first read the file, then apply modifications
-  - "Change directory to /path/to/dir" will set directory and then list contents
-  - "Find and read config files" will search for files and read matching results
-
-System Information:
+        return HELP_TEXT + f"""System Information:
   - Model: {self.config.model}
   - Context tokens: {self.config.max_context_tokens}
   - Working directory: {self.file_manager.get_working_directory()}
@@ -796,27 +1445,27 @@ System Information:
 
 Tip: Type 'END' on a new line to finish multi-line input.
 """
-        return help_text
     
-    async def _show_status_command(self):
+    def _show_status_command(self):
         """
         Show status information.
         
         Returns:
             Status message
         """
-        session_info = await self.get_session_info()
+        session_info = self.get_session_info()
         
         status_text = f"""
 === Session Status ===
 
 Token usage: ~{session_info['token_count']:,} tokens ({session_info['token_percentage']:.1f}% of maximum)
 Messages in history: {session_info['message_count']}
+Prompt cache: {session_info['cache_read_tokens']:,} tokens read, {session_info['cache_creation_tokens']:,} tokens written
 Model: {session_info['model']}
 Working directory: {self.file_manager.get_working_directory()}
 Debug mode: {'Enabled' if self.debug_mode else 'Disabled'}
 Registered tools: {len(self.tools)}
-Tool calls: {len(self.tool_call_history)}
+Tool calls: {self._tool_call_count}
 
 {session_info['loaded_files_info']}
 """
@@ -845,7 +1494,7 @@ Tool calls: {len(self.tool_call_history)}
             "input": {"path": path},
             "id": "manual_call_2"
         }
-        self.tool_call_history.append(tool_call)
+        self._record_tool_call(tool_call)
         
         # Call the handler
         return await handler.handle_tool_use({
@@ -853,6 +1502,57 @@ Tool calls: {len(self.tool_call_history)}
             "input": {"path": path}
         })
     
+    def _request_base(self) -> MappingProxyType:
+        """
+        Get the request parameters shared by every call, rebuilt only when the config changes.
+
+        Returns:
+            Read-only mapping with the model and max_tokens
+        """
+        key = (self.config.model, self.config.max_response_tokens)
+        if key != self._base_kwargs_key:
+            self._base_kwargs = MappingProxyType({"model": key[0], "max_tokens": key[1]})
+            self._base_kwargs_key = key
+        return self._base_kwargs
+
+    def _thinking_param(self, budget: int) -> MappingProxyType:
+        """
+        Get the thinking parameter for a budget, reusing one mapping per budget.
+
+        Args:
+            budget: Thinking budget in tokens
+
+        Returns:
+            Read-only thinking parameter
+        """
+        param = self._thinking_params.get(budget)
+        if param is None:
+            param = self._thinking_params[budget] = MappingProxyType(
+                {"type": "enabled", "budget_tokens": budget}
+            )
+        return param
+
+    def _thinking_budget(self, message: str) -> int:
+        """
+        Pick a thinking budget that scales with the size and complexity of a message.
+
+        Args:
+            message: User message text
+
+        Returns:
+            Thinking budget in tokens, between the configured minimum and maximum
+        """
+        low = self.config.thinking_budget_min
+        high = self.config.thinking_budget_max
+
+        # Code blocks and long prompts get the full budget
+        est_tokens = len(message) // 4
+        if "```" in message or est_tokens >= 2000:
+            return high
+        if est_tokens < 200:
+            return low
+        return max(low, min(high, 8000))
+
     def _extract_text_from_response(self, response) -> str:
         """
         Extract text content from a Claude API response.
@@ -863,33 +1563,250 @@ Tool calls: {len(self.tool_call_history)}
         Returns:
             Extracted text content
         """
-        text_content = ""
-        
-        if hasattr(response, 'content') and response.content:
-            for content_block in response.content:
-                if content_block.type == "text":
-                    text_content += content_block.text
-        
-        return text_content
-    
-    async def get_session_info(self) -> Dict[str, Any]:
+        return "".join(
+            block.text for block in (getattr(response, "content", None) or ()) if getattr(block, "type", None) == "text"
+        )
+
+    async def _get_formatted_history(self) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Get the system message and API-formatted history, reusing the previous result.
+        Messages appended since the last call are formatted and added to it; if
+        the history was cleared or summarized, the whole history is rebuilt.
+
+        Returns:
+            Tuple of (system_message, formatted_messages)
+        """
+        cm = self.conversation_manager
+        cache = self._fmt_cache
+
+        delta = cm.messages_since(cache["version"]) if cache["version"] >= 0 else None
+        if delta is None:
+            version = cm.version
+            system_message, message_objs = await cm.extract_system_message()
+            cache["system"] = system_message
+            cache["formatted"] = await asyncio.to_thread(cm.format_messages_for_api, message_objs)
+        else:
+            version, new_messages = delta
+            if new_messages:
+                system_message, message_objs = cm.split_messages(new_messages)
+                if system_message is not None:
+                    cache["system"] = system_message
+                # A new list, since earlier requests may still hold the previous one
+                cache["formatted"] = cache["formatted"] + cm.format_messages_for_api(message_objs)
+
+        cache["version"] = version
+        return cache["system"], cache["formatted"]
+
+    def _response_cache_key(self, prefix_hash: bytes, thinking_enabled: bool) -> bytes:
+        """
+        Build the exact-match response cache key for a request.
+
+        Args:
+            prefix_hash: Rolling hash of the conversation history
+            thinking_enabled: Whether thinking is enabled
+
+        Returns:
+            BLAKE2b digest of the model, history, tool definitions and thinking flag
+        """
+        key = hashlib.blake2b(self.config.model.encode("utf-8"))
+        key.update(prefix_hash)
+        key.update(self._tools_digest)
+        key.update(b"\x01" if thinking_enabled else b"\x00")
+        return key.digest()
+
+    def _get_cached_response(self, key: bytes) -> Optional[str]:
+        """
+        Look up a response in the exact-match cache.
+
+        Args:
+            key: Response cache key
+
+        Returns:
+            Cached response text or None on a miss
+        """
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            self._response_cache.move_to_end(key)
+        return cached
+
+    def _store_cached_response(self, key: bytes, response: str) -> None:
+        """
+        Store a response in the exact-match cache, evicting the least recently used entry.
+
+        Args:
+            key: Response cache key
+            response: Complete response text
+        """
+        max_size = self.config.response_cache_size
+        if max_size <= 0:
+            return
+
+        self._response_cache[key] = response
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > max_size:
+            self._response_cache.popitem(last=False)
+
+    async def _tool_cache_key(self, tool_name: str, tool_input: Any) -> Optional[Tuple]:
+        """
+        Build the tool result cache key for a read-only tool call.
+        Keys include the working directory, and for file tools the file's
+        modification time, so edits made outside the assistant are picked up.
+
+        Args:
+            tool_name: Name of the tool
+            tool_input: Tool input parameters
+
+        Returns:
+            Cache key, or None if the call should not be cached
+        """
+        if tool_name not in CACHEABLE_TOOLS or self.config.tool_cache_size <= 0 or not isinstance(tool_input, dict):
+            return None
+
+        key = (tool_name, self.file_manager.get_working_directory(), dumps_sorted(tool_input))
+        if CACHEABLE_TOOLS[tool_name] is None:
+            path = tool_input.get("path") or tool_input.get("filepath")
+            if not path:
+                return None
+            try:
+                stat = await asyncio.to_thread(os.stat, self.file_manager._get_absolute_path(path))
+            except OSError:
+                return None
+            key += (stat.st_mtime_ns, stat.st_size)
+        return key
+
+    def _get_cached_tool_result(self, key: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a tool result in the tool result cache.
+
+        Args:
+            key: Tool result cache key, or None
+
+        Returns:
+            Copy of the cached result, or None on a miss or after its TTL
+        """
+        if key is None:
+            return None
+
+        cached = self._tool_cache.get(key)
+        if cached is None:
+            return None
+
+        expires_at, result = cached
+        if expires_at is not None and time.monotonic() > expires_at:
+            del self._tool_cache[key]
+            return None
+
+        self._tool_cache.move_to_end(key)
+        # Callers attach chained results to the dict, so the cached one is never handed out
+        return dict(result)
+
+    def _store_cached_tool_result(self, key: Optional[Tuple], tool_name: str, result: Dict[str, Any]) -> None:
+        """
+        Store a successful tool result, evicting the least recently used entry.
+
+        Args:
+            key: Tool result cache key, or None to skip caching
+            tool_name: Name of the tool
+            result: Tool result
+        """
+        if key is None or not isinstance(result, dict) or "error" in result:
+            return
+
+        ttl = CACHEABLE_TOOLS[tool_name]
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._tool_cache[key] = (expires_at, dict(result))
+        self._tool_cache.move_to_end(key)
+        while len(self._tool_cache) > self.config.tool_cache_size:
+            self._tool_cache.popitem(last=False)
+
+    def _build_cached_system(self, system_message: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Wrap the system message in a text block marked as a prompt-cache breakpoint.
+
+        Args:
+            system_message: System message text, if any
+
+        Returns:
+            System content blocks for the API, or None if there is no system message
+        """
+        if not system_message:
+            return None
+
+        # The system message rarely changes, so reuse the blocks built for it last time
+        cached_message, cached_blocks = self._system_blocks
+        if cached_message == system_message:
+            return cached_blocks
+
+        blocks = [{"type": "text", "text": system_message, "cache_control": EPHEMERAL_CACHE}]
+        self._system_blocks = (system_message, blocks)
+        return blocks
+
+    def _apply_cache_breakpoint(self, formatted_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Mark the last stable turn (the message before the new user message) as a
+        prompt-cache breakpoint so the shared history prefix is reused across calls.
+
+        The tagged message and its content list are copied, so the conversation
+        history itself is never modified.
+
+        Args:
+            formatted_messages: Messages formatted for the API
+
+        Returns:
+            Messages with a cache_control breakpoint on the second-to-last message
+        """
+        if len(formatted_messages) < 2:
+            return formatted_messages
+
+        stable = formatted_messages[-2]
+        content = stable.get("content")
+        if not isinstance(content, list) or not content or not isinstance(content[-1], dict):
+            return formatted_messages
+
+        tagged_content = content[:-1] + [{**content[-1], "cache_control": EPHEMERAL_CACHE}]
+        return formatted_messages[:-2] + [{**stable, "content": tagged_content}, formatted_messages[-1]]
+
+    def _record_cache_usage(self, response) -> None:
+        """
+        Accumulate prompt-cache telemetry from a Claude API response.
+
+        Args:
+            response: Claude API response (or final streamed message)
+        """
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+
+        cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+        cache_creation = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        self.cache_stats["cache_read_input_tokens"] += cache_read
+        self.cache_stats["cache_creation_input_tokens"] += cache_creation
+
+        if self.debug_mode:
+            print(f"\n[DEBUG] Prompt cache: {cache_read} tokens read, {cache_creation} tokens written")
+
+    def get_session_info(self) -> Dict[str, Any]:
         """
         Get information about the current session.
         
         Returns:
             Dictionary with session information
         """
-        token_count = self.conversation_manager.get_token_usage()
-        token_percentage = self.conversation_manager.get_token_percentage()
-        message_count = len(self.conversation_manager.get_messages())
-        loaded_files_info = self.conversation_manager.get_loaded_files_info()
+        cm = self.conversation_manager
+
+        # Token counts are tracked incrementally and the file summary is memoized
+        token_count, token_percentage = cm.get_token_stats()
+        message_count = len(cm.get_messages())
+        loaded_files_info = cm.get_loaded_files_info()
         
         return {
             "token_count": token_count,
             "token_percentage": token_percentage,
             "message_count": message_count,
             "loaded_files_info": loaded_files_info,
-            "model": self.config.model
+            "model": self.config.model,
+            "cache_read_tokens": self.cache_stats["cache_read_input_tokens"],
+            "cache_creation_tokens": self.cache_stats["cache_creation_input_tokens"]
         }
         
     def print_tool_status(self, tool_name: str, tool_input: Dict[str, Any]) -> None:
@@ -10,6 +10,8 @@ import anthropic
 import json
 
 from config import Config
+from agents.chat_agent import get_shared_client
+from utils.json_utils import loads
 
 
 class RouterAgent:
@@ -18,20 +20,22 @@ class RouterAgent:
     Uses Claude API for more sophisticated command understanding.
     """
     
-    def __init__(self, api_key: str, config: Config):
+    def __init__(self, api_key: str, config: Config, client: Optional[anthropic.AsyncAnthropic] = None):
         """
         Initialize the router agent.
         
         Args:
             api_key: Anthropic API key
             config: Application configuration
+            client: Optional Anthropic client to use instead of the shared one
         """
         # Create the client with the API key directly
         # Debug to make sure we have an API key
         if not api_key:
             print("Warning: No API key provided to RouterAgent")
             
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Use the shared async client so routing does not block the event loop
+        self.client = client if client is not None else get_shared_client(api_key)
         self.config = config
         self.available_commands = self._get_available_commands()
     
@@ -60,7 +64,7 @@ class RouterAgent:
         
         try:
             # Make API call to Claude to determine if input is a command
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model=self.config.router_model,
                 max_tokens=self.config.router_max_tokens,
                 system=router_prompt,
@@ -169,18 +173,16 @@ IMPORTANT: ONLY return JSON - no explanations, markdown, or other text.
         Returns:
             Extracted text content
         """
-        text_content = ""
-        
         if hasattr(response, 'content') and response.content:
-            for content_block in response.content:
-                if content_block.type == "text":
-                    text_content += content_block.text
+            return "".join(
+                content_block.text for content_block in response.content if content_block.type == "text"
+            )
         
-        return text_content
+        return ""
     
     def _parse_router_response(self, response_text: str, original_input: str) -> Optional[Dict[str, Any]]:
         try:
-            response_json = json.loads(response_text)
+            response_json = loads(response_text)
         
             if not response_json.get('is_command', False):
                 return None
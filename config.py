@@ -11,13 +11,34 @@ class Config:
         self.model = "claude-3-7-sonnet-20250219"  # Most recent model as of the provided date
         self.max_context_tokens = 200000
         self.max_response_tokens = 64000
+        self.thinking_budget_min = 2048  # Thinking budget for short conversational turns
+        self.thinking_budget_max = 16000  # Thinking budget for long or code-heavy turns
         
         # Application settings
         self.force_tool_usage = True  # Force tools to be used even if Claude doesn't recognize them
         self.stream_responses = True
         self.typing_simulation_delay = 0.01  # Delay for simulated typing effect
+        self.stream_coalesce_chars = 128  # Flush buffered stream text at this many characters
+        self.stream_coalesce_ms = 15  # ...or after this many milliseconds
         self.use_colors = True
+        self.max_tool_concurrency = 8  # Maximum tool calls from one response running at once
+        self.tool_history_max = 256  # Tool calls kept for /history and auto-chaining
+        self.tool_result_max_chars = 0  # Truncate tool results recorded in the history (0 keeps them whole)
+        self.tool_result_preview_chars = 2000  # Result characters stored per tool record; the rest is kept aside (0 stores all)
         
+        # Cache settings
+        self.response_cache_size = 1024  # Max exact-match responses kept in memory (0 disables)
+        self.tool_cache_size = 256  # Max read-only tool results kept in memory (0 disables)
+        self.semantic_cache_enabled = False  # Requires the optional fastembed and faiss packages
+        self.semantic_cache_threshold = 0.92  # Minimum cosine similarity for a semantic cache hit
+        self.semantic_cache_size = 512  # Max responses kept in the semantic cache
+
+        # Batch settings
+        self.batch_requests_enabled = False  # Send one-shot (non-streamed) requests via the Message Batches API
+        self.batch_window_ms = 10  # Wait this long for concurrent requests to join a batch
+        self.batch_max_size = 16  # Maximum requests per batch
+        self.batch_poll_interval = 1.0  # Seconds between batch status checks
+
         # File settings
         self.default_encoding = "utf-8"
         self.fallback_encoding = "latin-1"
@@ -11,6 +11,66 @@ from typing import Dict, List, Any, Optional
 # Import terminal utilities
 from utils.terminal_utils import print_status
 
+# Patterns are compiled once here; each list is tried in order, as before
+CODE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'code:generate:(.+)',
+    r'code:change:(.+)',
+    r'generate\s+code\s+(?:for|in)\s+(.+)',
+    r'modify\s+(?:the\s+)?code\s+(?:in|of)\s+(.+)'
+))
+
+DIRECTORY_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    # Explicit commands
+    r'code:workdir:(.+)',
+    r'set\s+working\s+directory\s+to\s+(.+)',
+    r'change\s+(?:the\s+)?(?:working\s+)?directory\s+to\s+(.+)',
+    r'cd\s+(.+)',
+    # More general patterns
+    r'(?:use|switch\s+to)\s+(?:the\s+)?directory\s+(.+)',
+    r'(?:make|set)\s+(.+)\s+(?:as|the)\s+(?:working|current)\s+directory',
+    r'working\s+directory\s+(?:should\s+be|is)\s+(.+)',
+    # Additional patterns to catch more variations
+    r'set\s+(?:the\s+)?workingdir\s+to\s+(.+)',
+    r'change\s+(?:the\s+)?workingdir\s+to\s+(.+)',
+    r'(?:can\s+you|please|could\s+you)?\s+set\s+(?:the\s+)?(?:working\s+directory|workingdir)\s+to\s+(.+)',
+    r'(?:can\s+you|please|could\s+you)?\s+change\s+(?:the\s+)?(?:working\s+directory|workingdir)\s+to\s+(.+)'
+))
+
+LIST_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'code:list',
+    r'list\s+(?:the\s+)?(?:files|contents)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
+    r'show\s+(?:the\s+)?(?:files|contents)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
+    r'what\s+(?:files|contents)\s+(?:are|do\s+we\s+have)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
+    r'directory\s+(?:files|contents)',
+    r'\bls\b',
+    r'\bdir\b'
+))
+
+READ_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'code:read:(.+)',
+    r'read\s+(?:the\s+)?(?:python\s+)?files?\s+(?:called\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
+    r'show\s+(?:the\s+)?(?:content|contents)\s+of\s+(?:file\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
+    r'display\s+(?:the\s+)?(?:file|content)\s+(?:of\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
+    r'open\s+(?:the\s+)?files?\s+([^\s,]+(?:\s*,\s*[^\s,]+)*)',
+    r'cat\s+([^\s,]+(?:\s*,\s*[^\s,]+)*)'
+))
+
+# Any directory, list or read command; one scan rules out most chat messages
+# (code commands are never handled directly, so they are not part of it)
+DIRECT_COMMAND_PATTERN = re.compile(
+    "|".join(f"(?:{p.pattern})" for p in DIRECTORY_PATTERNS + LIST_PATTERNS + READ_PATTERNS),
+    re.IGNORECASE
+)
+
+COMPOUND_COMMAND_PATTERN = re.compile(
+    r'(?:change|set)\s+(?:the\s+)?(?:working\s+)?directory.*?(?:and|then)\s+(?:read|show|display)', re.IGNORECASE
+)
+COMPOUND_FILES_PATTERN = re.compile(r'(?:and|then)\s+read\s+(?:the\s+)?(?:files?\s+)?(.+?)(?:$|;)', re.IGNORECASE)
+FILE_NAME_PATTERN = re.compile(r'(\S+\.\w+)')
+TRAILING_CLAUSE_PATTERN = re.compile(r'^(.*?)(?:\s+(?:and|then)\s+.*)?$', re.IGNORECASE)
+LIST_PATH_PATTERN = re.compile(r'(?:in|of)\s+(?:the\s+)?(?:directory|folder)?\s+([^\s,]+)', re.IGNORECASE)
+
+
 class DirectCommandHandler:
     """
     Handles commands directly, bypassing Claude's tool calling when needed.
@@ -98,8 +158,12 @@ class DirectCommandHandler:
                     return "File listing command processed."
             # Let other code: commands continue to the standard parsing
         
+        # Nothing below can match a message that matches none of the command patterns
+        if not DIRECT_COMMAND_PATTERN.search(message):
+            return None
+        
         # Handle compound commands like "change directory to X and read files Y"  
-        if re.search(r'(?:change|set)\s+(?:the\s+)?(?:working\s+)?directory.*?(?:and|then)\s+(?:read|show|display)', message, re.IGNORECASE):
+        if COMPOUND_COMMAND_PATTERN.search(message):
             if self.debug_mode:
                 print(f"[DIRECT] Detected compound directory+files command")
             
@@ -137,15 +201,8 @@ class DirectCommandHandler:
             True if command was processed, False otherwise
         """
         # Detect code command patterns
-        code_patterns = [
-            r'code:generate:(.+)',
-            r'code:change:(.+)',
-            r'generate\s+code\s+(?:for|in)\s+(.+)',
-            r'modify\s+(?:the\s+)?code\s+(?:in|of)\s+(.+)'
-        ]
-        
-        for pattern in code_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
+        for pattern in CODE_PATTERNS:
+            match = pattern.search(message)
             if match:
                 # We found a code command, but we'll let the agent handle it
                 # through regular tool calls rather than executing directly
@@ -172,7 +229,7 @@ class DirectCommandHandler:
         files_to_read = []
         
         # Extract files to read from compound commands
-        compound_match = re.search(r'(?:and|then)\s+read\s+(?:the\s+)?(?:files?\s+)?(.+?)(?:$|;)', message, re.IGNORECASE)
+        compound_match = COMPOUND_FILES_PATTERN.search(message)
         if compound_match:
             compound_cmd = True
             files_part = compound_match.group(1).strip()
@@ -188,7 +245,7 @@ class DirectCommandHandler:
                     files_to_read = [words[0]]
                 elif "and" in files_part.lower():
                     # Try to handle "file1.py and file2.py"
-                    file_matches = re.findall(r'(\S+\.\w+)', files_part)
+                    file_matches = FILE_NAME_PATTERN.findall(files_part)
                     if file_matches:
                         files_to_read = file_matches
                     else:
@@ -213,32 +270,15 @@ class DirectCommandHandler:
                 print(f"[DIRECT] Files to read: {files_to_read}")
         
         # Detect directory change intent
-        directory_patterns = [
-            # Explicit commands
-            r'code:workdir:(.+)',
-            r'set\s+working\s+directory\s+to\s+(.+)',
-            r'change\s+(?:the\s+)?(?:working\s+)?directory\s+to\s+(.+)',
-            r'cd\s+(.+)',
-            # More general patterns
-            r'(?:use|switch\s+to)\s+(?:the\s+)?directory\s+(.+)',
-            r'(?:make|set)\s+(.+)\s+(?:as|the)\s+(?:working|current)\s+directory',
-            r'working\s+directory\s+(?:should\s+be|is)\s+(.+)',
-            # Additional patterns to catch more variations
-            r'set\s+(?:the\s+)?workingdir\s+to\s+(.+)',
-            r'change\s+(?:the\s+)?workingdir\s+to\s+(.+)',
-            r'(?:can\s+you|please|could\s+you)?\s+set\s+(?:the\s+)?(?:working\s+directory|workingdir)\s+to\s+(.+)',
-            r'(?:can\s+you|please|could\s+you)?\s+change\s+(?:the\s+)?(?:working\s+directory|workingdir)\s+to\s+(.+)'
-        ]
-    
         path = None
-        for pattern in directory_patterns:
-            match = re.search(pattern, base_message, re.IGNORECASE)
+        for pattern in DIRECTORY_PATTERNS:
+            match = pattern.search(base_message)
             if match:
                 path = match.group(1).strip().strip('"\'')
                 
                 # Clean up the path - remove any trailing "and" or "then" phrases
                 # that might have been included in the match
-                and_then_match = re.search(r'^(.*?)(?:\s+(?:and|then)\s+.*)?$', path, re.IGNORECASE)
+                and_then_match = TRAILING_CLAUSE_PATTERN.search(path)
                 if and_then_match:
                     path = and_then_match.group(1).strip()
                 
@@ -293,8 +333,7 @@ class DirectCommandHandler:
             if self.debug_mode:
                 print(f"[DIRECT] Chaining file reading after directory change: {files_to_read}")
             
-            for file_path in files_to_read:
-                await self._read_single_file(file_path)
+            await self._read_files(files_to_read)
     
         return True
 
@@ -308,17 +347,6 @@ class DirectCommandHandler:
         Returns:
             True if command was processed, False otherwise
         """
-        # Detect list intent
-        list_patterns = [
-            r'code:list',
-            r'list\s+(?:the\s+)?(?:files|contents)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
-            r'show\s+(?:the\s+)?(?:files|contents)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
-            r'what\s+(?:files|contents)\s+(?:are|do\s+we\s+have)\s+(?:in|of)?\s+(?:the\s+)?(?:directory|folder)?',
-            r'directory\s+(?:files|contents)',
-            r'\bls\b',
-            r'\bdir\b'
-        ]
-        
         # Special case for 'code:list'
         if message.strip() == 'code:list':
             # Print command status
@@ -343,9 +371,10 @@ class DirectCommandHandler:
                 
             # Display loaded files
             if "files" in result and result["files"]:
-                print("\nLoaded files:")
+                lines = ["\nLoaded files:"]
                 for file_info in result["files"]:
-                    print(f"- {file_info['path']} ({file_info.get('lines', '?')} lines)")
+                    lines.append(f"- {file_info['path']} ({file_info.get('lines', '?')} lines)")
+                print("\n".join(lines))
                 
             if "summary" in result:
                 print(f"\n{result['summary']}")
@@ -353,17 +382,11 @@ class DirectCommandHandler:
             return True
             
         # Regular directory listing
-        is_list_command = False
-        for pattern in list_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                is_list_command = True
-                break
-        
-        if not is_list_command:
+        if not any(pattern.search(message) for pattern in LIST_PATTERNS):
             return False
         
         # Extract path or use current directory
-        path_match = re.search(r'(?:in|of)\s+(?:the\s+)?(?:directory|folder)?\s+([^\s,]+)', message, re.IGNORECASE)
+        path_match = LIST_PATH_PATTERN.search(message)
         path = path_match.group(1).strip().strip('"\'') if path_match else self.file_manager.get_working_directory()
         
         # Print command status
@@ -396,15 +419,16 @@ class DirectCommandHandler:
         
     def _display_directory_contents(self, result, path):
         """Display directory contents in a condensed format."""
-        print(f"Contents of {path}:")
+        # Large listings are written with a single print
+        lines = [f"Contents of {path}:"]
         
         if "directories" in result and result["directories"]:
-            print("\nFolders:")
+            lines.append("\nFolders:")
             for d in result["directories"]:
-                print(f"- {d['name']}/")
+                lines.append(f"- {d['name']}/")
         
         if "files" in result and result["files"]:
-            print("\nFiles:")
+            lines.append("\nFiles:")
             # Display files with condensed information
             for f in result["files"]:
                 size = f.get('size_bytes', 0)
@@ -416,9 +440,10 @@ class DirectCommandHandler:
                 else:
                     size_str = f"{size/(1024*1024):.1f} MB"
                     
-                print(f"- {f['name']} ({size_str})")
+                lines.append(f"- {f['name']} ({size_str})")
         
-        print(f"\nTotal: {result.get('total_entries', 0)} items")
+        lines.append(f"\nTotal: {result.get('total_entries', 0)} items")
+        print("\n".join(lines))
         
     async def _list_current_directory(self, condensed=False) -> None:
         """List the contents of the current working directory."""
@@ -454,16 +479,6 @@ class DirectCommandHandler:
         Returns:
             True if command was processed, False otherwise
         """
-        # Detect read intent
-        read_patterns = [
-            r'code:read:(.+)',
-            r'read\s+(?:the\s+)?(?:python\s+)?files?\s+(?:called\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
-            r'show\s+(?:the\s+)?(?:content|contents)\s+of\s+(?:file\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
-            r'display\s+(?:the\s+)?(?:file|content)\s+(?:of\s+)?([^\s,]+(?:\s*,\s*[^\s,]+)*)',
-            r'open\s+(?:the\s+)?files?\s+([^\s,]+(?:\s*,\s*[^\s,]+)*)',
-            r'cat\s+([^\s,]+(?:\s*,\s*[^\s,]+)*)'
-        ]
-        
         filepath = None
         multiple_files = False
         filepaths = []
@@ -485,8 +500,8 @@ class DirectCommandHandler:
                 self.print_command_status("read", f"Reading file: {command_param}")
         else:
             # Try the regular patterns
-            for pattern in read_patterns:
-                match = re.search(pattern, message, re.IGNORECASE)
+            for pattern in READ_PATTERNS:
+                match = pattern.search(message)
                 if match:
                     matched_paths = match.group(1).strip().strip('"\'')
                     
@@ -507,8 +522,7 @@ class DirectCommandHandler:
         
         # Handle multiple files case
         if multiple_files or filepaths:
-            for file_path in filepaths:
-                await self._read_single_file(file_path)
+            await self._read_files(filepaths)
             return True
         
         # Handle single file case
@@ -516,6 +530,28 @@ class DirectCommandHandler:
     
     async def _read_single_file(self, filepath: str) -> bool:
         """Read a single file and display its info."""
+        result, analyze_result = await self._load_file(filepath)
+        return self._display_file(filepath, result, analyze_result)
+
+    async def _read_files(self, filepaths: List[str]) -> None:
+        """Read several files concurrently and display them in the given order."""
+        outcomes = await asyncio.gather(*(self._load_file(fp) for fp in filepaths), return_exceptions=True)
+        for filepath, outcome in zip(filepaths, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"[ERROR] Failed to read {filepath}: {outcome}")
+            else:
+                self._display_file(filepath, *outcome)
+
+    async def _load_file(self, filepath: str):
+        """
+        Run the read_file tool for a file, plus a basic analysis for Python files.
+        
+        Args:
+            filepath: Path to the file
+            
+        Returns:
+            Tuple of (read result, analysis result); either may be None
+        """
         if self.debug_mode:
             print(f"[DIRECT] Reading file: {filepath}")
         
@@ -525,8 +561,7 @@ class DirectCommandHandler:
         # Get the handler
         handler = self.tool_handlers.get('read_file')
         if not handler:
-            print("[ERROR] No handler found for read_file")
-            return False
+            return None, None
         
         # Execute the tool directly
         result = await handler.handle_tool_use({
@@ -534,18 +569,9 @@ class DirectCommandHandler:
             "input": {"path": filepath}
         })
         
-        # Print the result - only print basic info, not the full file content
-        if "error" in result:
-            print(f"[ERROR] {result['error']}")
-            return False
-        
-        print(f"Successfully read file: {filepath}")
-        # Show a preview in non-debug mode as well, but keep it shorter
-        content_preview = result['content'][:200] + '...' if len(result['content']) > 200 else result['content']
-        print(f"\nPreview:\n```\n{content_preview}\n```\n")
-        
         # NEW: Check if we should automatically analyze Python files
-        if filepath.endswith('.py'):
+        analyze_result = None
+        if "error" not in result and filepath.endswith('.py'):
             analyze_handler = self.tool_handlers.get('analyze_code')
             if analyze_handler:
                 print_status("🔗", f"Auto-analyzing Python file: {filepath}", "magenta")
@@ -557,10 +583,39 @@ class DirectCommandHandler:
                         "analysis_type": "basic"
                     }
                 })
+        
+        return result, analyze_result
+
+    def _display_file(self, filepath: str, result: Optional[Dict[str, Any]],
+                      analyze_result: Optional[Dict[str, Any]]) -> bool:
+        """
+        Display the outcome of reading a file.
+        
+        Args:
+            filepath: Path to the file
+            result: read_file result, or None if no handler is registered
+            analyze_result: analyze_code result, or None if no analysis ran
+            
+        Returns:
+            True if the file was read, False otherwise
+        """
+        if result is None:
+            print("[ERROR] No handler found for read_file")
+            return False
+        
+        # Print the result - only print basic info, not the full file content
+        if "error" in result:
+            print(f"[ERROR] {result['error']}")
+            return False
+        
+        print(f"Successfully read file: {filepath}")
+        # Show a preview in non-debug mode as well, but keep it shorter
+        content_preview = result['content'][:200] + '...' if len(result['content']) > 200 else result['content']
+        print(f"\nPreview:\n```\n{content_preview}\n```\n")
+        
+        if analyze_result and "error" not in analyze_result:
+            print(f"\nBasic code analysis:")
+            print(f"- Lines: {analyze_result.get('line_count', '?')}")
+            print(f"- Size: {analyze_result.get('size_bytes', '?')} bytes")
                 
-                if "error" not in analyze_result:
-                    print(f"\nBasic code analysis:")
-                    print(f"- Lines: {analyze_result.get('line_count', '?')}")
-                    print(f"- Size: {analyze_result.get('size_bytes', '?')} bytes")
-                
-        return True
\ No newline at end of file
+        return True
@@ -6,6 +6,7 @@ Uses a single chat agent with tool capabilities.
 import os
 import sys
 import asyncio
+import logging
 from typing import Dict, List, Optional, Any, Tuple
 import argparse
 
@@ -17,7 +18,7 @@ from managers.conversation_manager import ConversationManager
 from managers.file_manager import FileManager
 
 # Import agents
-from agents.chat_agent import ChatAgent
+from agents.chat_agent import ChatAgent, get_shared_client, validate_settings
 
 # Import tools
 from tools.file_tools import FileTools, register_file_tools, Tool
@@ -27,9 +28,7 @@ from tools.tool_chain_manager import ToolChainManager  # Add the import for Tool
 
 # Import utilities
 from utils.terminal_utils import get_multiline_input, print_colored, create_stream_callback
-
-# Import Anthropic SDK
-import anthropic
+from utils.logging_utils import setup_logging
 
 
 async def setup_system_message(app_context: Dict[str, Any]) -> None:
@@ -142,6 +141,9 @@ async def main():
     parser.add_argument("--api-key", help="Anthropic API key")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
     args = parser.parse_args()
+
+    # Errors are logged through a background thread so they never block the event loop
+    log_listener = setup_logging(logging.DEBUG if args.debug else logging.WARNING)
     
     # Get API key from arguments, environment, or prompt
     api_key = args.api_key or os.environ.get("ANTHROPIC_API_KEY")
@@ -155,14 +157,23 @@ async def main():
     if api_key:
         masked_key = api_key[:4] + "..." + api_key[-4:] if len(api_key) > 8 else "****"
         print(f"Using API key: {masked_key}")
-    else:
-        print("Warning: No API key provided")
+    
+    # Initialize configuration
+    config = Config()
+    
+    # Bad settings would only make the connection test fail with a misleading error
+    try:
+        validate_settings(api_key, config)
+    except ValueError as e:
+        print_colored(f"Error: {str(e)}", "red")
+        sys.exit(1)
     
     # Test the API connection directly
     try:
         print("Testing API connection...")
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
+        # Uses the shared pooled client, so the chat agent reuses this warm connection
+        client = get_shared_client(api_key)
+        response = await client.messages.create(
             model="claude-3-7-sonnet-20250219",
             max_tokens=10,
             messages=[
@@ -174,9 +185,6 @@ async def main():
         print(f"API connection test failed: {str(e)}")
         # Continue anyway to allow troubleshooting
     
-    # Initialize configuration
-    config = Config()
-    
     # Initialize managers
     conversation_manager = ConversationManager(max_tokens=config.max_context_tokens)
     file_manager = FileManager(conversation_manager)
@@ -213,7 +221,11 @@ async def main():
     
     # Initialize the enhanced chat agent with direct access to file_manager and debug mode
     debug_mode = args.debug
-    chat_agent = ChatAgent(api_key, config, conversation_manager, file_manager, debug_mode=debug_mode)
+    try:
+        chat_agent = ChatAgent(api_key, config, conversation_manager, file_manager, debug_mode=debug_mode)
+    except ValueError as e:
+        print_colored(f"Error: {str(e)}", "red")
+        sys.exit(1)
     chat_agent.register_tools(all_tools, tool_handlers)
     
     # Initialize direct command handler
@@ -313,6 +325,9 @@ async def main():
                     print_colored("\nAssistant: ", "green", bold=True)
                     await chat_agent.send_message(user_input, callback)
         
+            # The reply is recorded in the background; wait for it so the token usage is current
+            await chat_agent.drain()
+
             # Show token usage if it's high
             token_percentage = conversation_manager.get_token_percentage()
             if token_percentage > 50:
@@ -326,6 +341,12 @@ async def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        await chat_agent.aclose()
+        # The agents share one client; close its connection pool once they are done
+        await get_shared_client(api_key).close()
+        get_shared_client.cache_clear()
+        log_listener.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -3,10 +3,31 @@ Manages conversation history and context for Claude interactions.
 """
 
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional, Any, Tuple
 import tiktoken
 import asyncio
 
+from utils.json_utils import dumps, dumps_sorted
+
+# Try to import blake3 for faster history hashing
+try:
+    import blake3
+    HAS_BLAKE3 = True
+except ImportError:
+    HAS_BLAKE3 = False
+
+
+# Full tool results kept for the newest tool records; older records keep only their preview
+TOOL_RESULT_BLOB_LIMIT = 16
+
+
+def _new_history_hasher():
+    """Create an empty hasher for the rolling history hash."""
+    return blake3.blake3() if HAS_BLAKE3 else hashlib.blake2b()
+
 
 class ConversationManager:
     """
@@ -25,6 +46,15 @@ class ConversationManager:
         self.token_count = 0
         self.summary: Optional[str] = None
         self.loaded_files: Dict[str, str] = {}  # Cache for loaded files
+        self._version = 0  # Incremented on every change to the message history
+        self._replaced_version = 0  # Version at which the history was last cleared or summarized
+        self._files_version = 0  # Incremented on every change to the loaded files
+        self._files_info_cache: Optional[Tuple[int, str]] = None  # (files version, summary)
+        self._system_split_cache: Optional[Tuple[int, Optional[str], List[Dict[str, Any]]]] = None  # (version, system, others)
+        self._rolling = _new_history_hasher()  # Hash of all messages, updated per message
+        self._tool_results: "OrderedDict[int, str]" = OrderedDict()  # Tool record ID -> full record text
+        self._tool_result_count = 0  # IDs handed out to tool records
+        self._lock = threading.RLock()  # History is also updated from worker threads
         
         # Initialize the tokenizer for Claude
         try:
@@ -43,16 +73,86 @@ class ConversationManager:
             content: Message content
         """
         # Format content according to Messages API format
-        message = {"role": role, "content": content}
-        est_tokens = self._count_tokens(content)
+        self._append_message({"role": role, "content": content})
+
+    def _append_message(self, message: Dict[str, Any]) -> None:
+        """
+        Append a message to the history and update the token count and hash.
         
-        self.messages.append(message)
-        self.token_count += est_tokens
+        Args:
+            message: Message dictionary with at least role and content
+        """
+        est_tokens = self._count_tokens(message["content"])
         
-        # If we're near the token limit, optimize the history
-        if self.token_count > self.max_tokens * 0.9:
-            self._optimize_history()
+        with self._lock:
+            self.messages.append(message)
+            self.token_count += est_tokens
+            self._version += 1
+            self._rolling.update(dumps_sorted(message))
+            
+            # If we're near the token limit, optimize the history
+            if self.token_count > self.max_tokens * 0.9:
+                self._optimize_history()
     
+    def add_tool_result(self, tool_name: str, tool_input: Any, result_text: str,
+                        preview_chars: int = 2000, chained: bool = False) -> None:
+        """
+        Record a tool call as a system message. Only a preview of a long result
+        is stored in the history; the full record is kept aside and used when
+        that message is the one sent to Claude.
+        
+        Args:
+            tool_name: Name of the tool that was called
+            tool_input: Tool input
+            result_text: Serialized tool result
+            preview_chars: Result characters kept in the history (0 keeps them all)
+            chained: Whether the tool was called automatically by a tool chain
+        """
+        if chained:
+            prefix = f"Chained tool '{tool_name}' was called automatically with input: {dumps(tool_input)} "
+        else:
+            prefix = f"Tool '{tool_name}' was called with input: {dumps(tool_input)} "
+        content = f"{prefix}and returned result: {result_text}"
+
+        if preview_chars <= 0 or len(result_text) <= preview_chars:
+            self.add_message("system", content)
+            return
+
+        with self._lock:
+            self._tool_result_count += 1
+            record_id = self._tool_result_count
+            self._tool_results[record_id] = content
+            if len(self._tool_results) > TOOL_RESULT_BLOB_LIMIT:
+                self._tool_results.popitem(last=False)
+
+        preview = (
+            f"{prefix}and returned result: {result_text[:preview_chars]}"
+            f"... [{len(result_text) - preview_chars} more characters in tool record {record_id}]"
+        )
+        self._append_message({"role": "system", "content": preview, "tool_record": record_id})
+
+    @property
+    def version(self) -> int:
+        """Version of the message history; it changes on every update."""
+        return self._version
+
+    def messages_since(self, version: int) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Get the messages appended since a given history version.
+        
+        Args:
+            version: History version returned by an earlier call or by the version property
+            
+        Returns:
+            Tuple of (current version, new messages), or None if the history was
+            cleared or summarized since that version
+        """
+        with self._lock:
+            if version < self._replaced_version:
+                return None
+            count = self._version - version
+            return self._version, self.messages[len(self.messages) - count:] if count else []
+
     def get_messages(self) -> List[Dict[str, str]]:
         """
         Get all messages in the conversation history.
@@ -71,6 +171,7 @@ class ConversationManager:
             content: File content
         """
         self.loaded_files[filepath] = content
+        self._files_version += 1
     
     def get_loaded_file(self, filepath: str) -> Optional[str]:
         """
@@ -93,12 +194,19 @@ class ConversationManager:
         """
         if not self.loaded_files:
             return "No files loaded."
+
+        # Counting lines scans every file, so reuse the summary until the files change
+        if self._files_info_cache and self._files_info_cache[0] == self._files_version:
+            return self._files_info_cache[1]
         
-        info = "Loaded files:\n"
-        for filepath in self.loaded_files:
-            file_lines = self.loaded_files[filepath].count('\n') + 1
-            file_size = len(self.loaded_files[filepath])
-            info += f"- {filepath} ({file_lines} lines, {file_size} bytes)\n"
+        parts = ["Loaded files:\n"]
+        for filepath, content in self.loaded_files.items():
+            file_lines = content.count('\n') + 1
+            file_size = len(content)
+            parts.append(f"- {filepath} ({file_lines} lines, {file_size} bytes)\n")
+        info = "".join(parts)
+
+        self._files_info_cache = (self._files_version, info)
         return info
     
     def _count_tokens(self, text: str) -> int:
@@ -152,6 +260,9 @@ class ConversationManager:
         # Only summarize if it offers significant reduction
         if removed_tokens > summary_tokens:
             self.messages = [{"role": "system", "content": self.summary}] + self.messages[-preserve_count:]
+            self._version += 1
+            self._replaced_version = self._version
+            self._rehash()
             self.token_count = summary_tokens + sum(self._count_tokens(msg["content"]) for msg in self.messages[-preserve_count:])
     
     def _update_summary(self, messages_to_summarize: List[Dict[str, str]]) -> None:
@@ -188,9 +299,30 @@ class ConversationManager:
     
     def clear(self) -> None:
         """Clear the conversation history, but keep loaded files."""
-        self.messages = []
-        self.token_count = 0
-        self.summary = None
+        with self._lock:
+            self.messages = []
+            self.token_count = 0
+            self.summary = None
+            self._version += 1
+            self._replaced_version = self._version
+            self._rolling = _new_history_hasher()
+            self._tool_results.clear()
+
+    def _rehash(self) -> None:
+        """Rebuild the rolling history hash after messages were replaced."""
+        self._rolling = _new_history_hasher()
+        for msg in self.messages:
+            self._rolling.update(dumps_sorted(msg))
+
+    def prefix_hash(self) -> bytes:
+        """
+        Get a hash of the full message history without re-serializing it.
+
+        Returns:
+            Digest of all messages in order
+        """
+        with self._lock:
+            return self._rolling.copy().digest()
         
     def get_token_usage(self) -> int:
         """
@@ -201,6 +333,16 @@ class ConversationManager:
         """
         return self.token_count
     
+    def get_token_stats(self) -> Tuple[int, float]:
+        """
+        Get the current token usage and its percentage of the maximum in one call.
+        
+        Returns:
+            Tuple of (token_count, percentage)
+        """
+        token_count = self.token_count
+        return token_count, (token_count / self.max_tokens) * 100
+    
     def get_token_percentage(self) -> float:
         """
         Get the percentage of tokens used relative to the maximum.
@@ -217,16 +359,53 @@ class ConversationManager:
         Returns:
             Tuple of (system_message, regular_messages)
         """
+        # The split only changes with the history, so skip the worker thread when it is current
+        cached = self._system_split_cache
+        if cached and cached[0] == self._version:
+            return cached[1], cached[2]
+        return await asyncio.to_thread(self._split_system_message)
+
+    def _split_system_message(self) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Split the history into the latest system message and the other messages.
+        
+        Returns:
+            Tuple of (system_message, regular_messages)
+        """
+        with self._lock:
+            version = self._version
+            messages = list(self.messages)
+
+        system_message, regular_messages = self.split_messages(messages)
+        self._system_split_cache = (version, system_message, regular_messages)
+        return system_message, regular_messages
+
+    def split_messages(self, messages: List[Dict[str, Any]]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Split messages into the latest system message and the other messages.
+        
+        Args:
+            messages: Messages from the history, in order
+            
+        Returns:
+            Tuple of (system_message, regular_messages); system_message is None
+            if the messages contain no system message
+        """
         system_message = None
         regular_messages = []
         
-        for msg in self.messages:
+        for msg in messages:
             if msg["role"] == "system":
                 # Keep the latest system message
-                system_message = msg["content"]
+                system_message = msg
             else:
                 # Ensure message format is correct
                 regular_messages.append(msg)
+
+        if system_message is not None:
+            # Only the message that is actually sent gets its full tool result back
+            record_id = system_message.get("tool_record")
+            system_message = self._tool_results.get(record_id, system_message["content"])
                 
         return system_message, regular_messages
 
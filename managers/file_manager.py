@@ -46,30 +46,32 @@ class FileManager:
         if cached_content is not None:
             return cached_content
         
+        # Opening, reading and closing happen in one worker thread hop
+        content = await asyncio.to_thread(self._read_text, filepath)
+        
+        # Cache the file
+        self.conversation_manager.add_loaded_file(filepath, content)
+        return content
+    
+    def _read_text(self, filepath: str) -> str:
+        """
+        Read a text file, falling back to latin-1 if it is not valid UTF-8 (blocking).
+        
+        Args:
+            filepath: Absolute path to the file
+            
+        Returns:
+            File content as string
+        """
         try:
             # Try primary encoding first
-            file_obj = await asyncio.to_thread(lambda: open(filepath, 'r', encoding='utf-8'))
-            try:
-                content = await asyncio.to_thread(file_obj.read)
-                # Cache the file
-                self.conversation_manager.add_loaded_file(filepath, content)
-                return content
-            finally:
-                await asyncio.to_thread(file_obj.close)
-                
+            with open(filepath, 'r', encoding='utf-8') as file:
+                return file.read()
         except UnicodeDecodeError:
             # Try fallback encoding
             try:
-                file_obj = await asyncio.to_thread(lambda: open(filepath, 'r', encoding='latin-1'))
-                try:
-                    content = await asyncio.to_thread(file_obj.read)
-                    
-                    # Cache the file
-                    self.conversation_manager.add_loaded_file(filepath, content)
-                    return content
-                finally:
-                    await asyncio.to_thread(file_obj.close)
-                    
+                with open(filepath, 'r', encoding='latin-1') as file:
+                    return file.read()
             except Exception as e:
                 raise IOError(f"Cannot read file: {str(e)}")
     
@@ -87,14 +89,8 @@ class FileManager:
         filepath = self._get_absolute_path(filepath)
         
         try:
-            # Create directory if it doesn't exist
-            dir_path = os.path.dirname(filepath)
-            if dir_path and not os.path.exists(dir_path):
-                os.makedirs(dir_path)
-                
-            # Write the file
-            async with asyncio.to_thread(open, filepath, 'w', encoding='utf-8') as file:
-                await asyncio.to_thread(file.write, content)
+            # Creating the directory and writing the file block, so they run in a worker thread
+            await asyncio.to_thread(self._write_text, filepath, content)
                 
             # Update the cache
             self.conversation_manager.add_loaded_file(filepath, content)
@@ -104,6 +100,23 @@ class FileManager:
             print(f"Error writing file: {str(e)}")
             return False
     
+    def _write_text(self, filepath: str, content: str) -> None:
+        """
+        Write a text file, creating its directory if needed (blocking).
+        
+        Args:
+            filepath: Absolute path to the file
+            content: Content to write
+        """
+        # Create directory if it doesn't exist
+        dir_path = os.path.dirname(filepath)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+            
+        # Write the file
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(content)
+    
     async def find_python_files(self, directory: str = '.', recursive: bool = False) -> List[str]:
         """
         Find Python files in a directory.
@@ -117,6 +130,20 @@ class FileManager:
         """
         directory = self._get_absolute_path(directory)
         
+        # Walking the tree blocks, so it runs in a worker thread
+        return await asyncio.to_thread(self._find_python_files, directory, recursive)
+    
+    def _find_python_files(self, directory: str, recursive: bool) -> List[str]:
+        """
+        Find Python files in a directory (blocking).
+        
+        Args:
+            directory: Absolute directory to search in
+            recursive: Whether to search recursively
+            
+        Returns:
+            List of Python file paths
+        """
         python_files = []
         
         # Make sure directory exists
@@ -0,0 +1,157 @@
+"""
+Semantic response cache for near-duplicate user messages.
+Embeds user messages locally and reuses responses for sufficiently similar ones.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.json_utils import dumps_sorted
+
+# Preceding messages that must match for a hit, so follow-ups like "yes" or
+# "continue" are only answered in the same context they were asked in
+CONTEXT_MESSAGES = 2
+
+# Nearest neighbours checked per lookup; the closest one may belong to another context
+SEARCH_K = 8
+
+
+class SemanticCacheManager:
+    """
+    Caches assistant responses keyed by a local embedding of the user message.
+    The embedding model and vector index are loaded lazily on first use; if the
+    optional dependencies (fastembed, faiss, numpy) are missing the cache disables itself.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        model_name: str = "BAAI/bge-small-en-v1.5",
+        dimension: int = 384,
+        max_entries: int = 512
+    ):
+        """
+        Initialize the semantic cache manager.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            model_name: Name of the fastembed text embedding model
+            dimension: Embedding dimension of the model
+            max_entries: Maximum number of cached responses
+        """
+        self.threshold = threshold
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.enabled = True
+        self._embed = None
+        self._faiss = None
+        self._np = None
+        self._entries: List[Tuple[Any, str, bytes]] = []  # (vector, response, context_hash) per index row
+
+    def _ensure_loaded(self) -> bool:
+        """
+        Lazily load the embedding model and vector index.
+
+        Returns:
+            True if the cache is usable, False otherwise
+        """
+        if not self.enabled:
+            return False
+        if self._embed is not None:
+            return True
+
+        try:
+            import numpy as np
+            import faiss
+            from fastembed import TextEmbedding
+        except ImportError:
+            print("Warning: fastembed/faiss not available, semantic response cache disabled")
+            self.enabled = False
+            return False
+
+        self._np = np
+        self._embed = TextEmbedding(self.model_name)
+        self._faiss = faiss.IndexFlatIP(self.dimension)
+        return True
+
+    @staticmethod
+    def context_hash(system_message: Optional[str], history: List[Dict[str, Any]]) -> bytes:
+        """
+        Hash the system message and the messages before the user message, so
+        hits are only served under the same system prompt and preceding exchange.
+
+        Args:
+            system_message: System message text
+            history: Messages before the current user message, in order
+
+        Returns:
+            BLAKE2b digest of the context
+        """
+        hasher = hashlib.blake2b((system_message or "").encode("utf-8"))
+        for msg in history[-CONTEXT_MESSAGES:]:
+            hasher.update(dumps_sorted(msg))
+        return hasher.digest()
+
+    def embed(self, message: str) -> Optional[Any]:
+        """
+        Embed and L2-normalize a message.
+
+        Args:
+            message: Text to embed
+
+        Returns:
+            Normalized embedding vector, or None if the cache is unavailable
+        """
+        if not self._ensure_loaded():
+            return None
+
+        vector = self._np.asarray(next(iter(self._embed.embed([message]))), dtype="float32")
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: Any, context_hash: bytes) -> Optional[str]:
+        """
+        Find a cached response for the most similar previous message asked in the same context.
+
+        Args:
+            vector: Normalized embedding of the user message
+            context_hash: Hash of the current context (see context_hash)
+
+        Returns:
+            Cached response text, or None if no entry is similar enough
+        """
+        if vector is None or not self._entries:
+            return None
+
+        scores, indices = self._faiss.search(vector[None, :], min(SEARCH_K, len(self._entries)))
+        for score, index in zip(scores[0], indices[0]):
+            # Results are ordered by similarity, so the rest are below the threshold too
+            if index < 0 or float(score) < self.threshold:
+                break
+            _, response, entry_hash = self._entries[int(index)]
+            if entry_hash == context_hash:
+                return response
+        return None
+
+    def add(self, vector: Any, context_hash: bytes, response: str) -> None:
+        """
+        Add a response to the cache, evicting the oldest quarter when it is full.
+
+        Args:
+            vector: Normalized embedding of the user message
+            context_hash: Hash of the context the response was produced in
+            response: Assistant response text
+        """
+        if vector is None:
+            return
+
+        self._entries.append((vector, response, context_hash))
+        if len(self._entries) <= self.max_entries:
+            self._faiss.add(vector[None, :])
+            return
+
+        # A flat index cannot drop rows cheaply, so rebuild it from the kept entries
+        self._entries = self._entries[len(self._entries) // 4:]
+        self._faiss.reset()
+        self._faiss.add(self._np.stack([entry[0] for entry in self._entries]))
@@ -5,6 +5,7 @@ Tools for file-related operations using Claude's tool functionality.
 import os
 import sys
 import asyncio
+import traceback
 from typing import Dict, List, Optional, Any, Tuple
 import difflib
 import re
@@ -22,15 +23,19 @@ class Tool:
         self.name = name
         self.description = description
         self.input_schema = input_schema
+        self._dict = None  # API schema, built on first use
         
     def to_dict(self):
         """Convert to dictionary format expected by Anthropic API"""
-        return {
-            "type": "custom",  # Updated to match Anthropic API expectations
-            "name": self.name,
-            "description": self.description,
-            "input_schema": self.input_schema
-        }
+        # The schema never changes, so every agent registering this tool shares one dict
+        if self._dict is None:
+            self._dict = {
+                "type": "custom",  # Updated to match Anthropic API expectations
+                "name": self.name,
+                "description": self.description,
+                "input_schema": self.input_schema
+            }
+        return self._dict
 # Define our own ToolUseBlock class 
 class ToolUseBlock:
     def __init__(self, name, input):
@@ -314,7 +319,6 @@ class FileTools:
             else:
                 return {"error": f"Unknown tool: {tool_name}"}
         except Exception as e:
-            import traceback
             traceback.print_exc()
             return {
                 "error": str(e)
@@ -435,7 +439,6 @@ class FileTools:
             return {"error": f"Path is a directory, not a file: {path}"}
         except Exception as e:
             if self.debug_mode:
-                import traceback
                 traceback.print_exc()
             return {"error": f"Error reading file: {str(e)}", "exception_type": type(e).__name__}
     
@@ -496,9 +499,6 @@ class FileTools:
             if not os.path.isdir(path):
                 return {"error": f"Not a directory: {path}"}
             
-            # Get directory contents
-            entries = os.listdir(path)
-            
             # Compile regex if pattern provided
             pattern = None
             if file_pattern:
@@ -507,35 +507,8 @@ class FileTools:
                 except re.error:
                     return {"error": f"Invalid regex pattern: {file_pattern}"}
             
-            # Filter and classify entries
-            files = []
-            directories = []
-            
-            for entry in entries:
-                # Skip hidden files if not requested
-                if not include_hidden and entry.startswith('.'):
-                    continue
-                
-                # Check pattern if provided
-                if pattern and not pattern.search(entry):
-                    continue
-                
-                full_path = os.path.join(path, entry)
-                
-                if os.path.isdir(full_path):
-                    directories.append({
-                        "name": entry,
-                        "type": "directory",
-                        "path": full_path
-                    })
-                else:
-                    size = os.path.getsize(full_path)
-                    files.append({
-                        "name": entry,
-                        "type": "file",
-                        "path": full_path,
-                        "size_bytes": size
-                    })
+            # Listing and stat calls block, so they run in a worker thread
+            directories, files = await asyncio.to_thread(self._scan_directory, path, include_hidden, pattern)
             
             return {
                 "path": path,
@@ -578,35 +551,8 @@ class FileTools:
             except re.error:
                 return {"error": f"Invalid regex pattern: {pattern_str}"}
             
-            # Find matching files
-            matches = []
-            
-            for root, dirs, files in os.walk(path):
-                # Check depth limit
-                if max_depth > 0:
-                    relative_path = os.path.relpath(root, path)
-                    depth = 0 if relative_path == '.' else relative_path.count(os.sep) + 1
-                    if depth >= max_depth:
-                        dirs.clear()  # Don't descend further
-                
-                # Process files in this directory
-                for filename in files:
-                    if pattern.search(filename):
-                        file_path = os.path.join(root, filename)
-                        try:
-                            size = os.path.getsize(file_path)
-                            matches.append({
-                                "name": filename,
-                                "path": file_path,
-                                "size_bytes": size
-                            })
-                        except:
-                            # Skip if we can't get file info
-                            pass
-                
-                # If not recursive, break after first iteration
-                if not recursive:
-                    break
+            # Walking the tree blocks, so it runs in a worker thread
+            matches = await asyncio.to_thread(self._walk_matches, path, pattern, recursive, max_depth)
             
             return {
                 "matches": matches,
@@ -618,6 +564,94 @@ class FileTools:
         except Exception as e:
             return {"error": f"Error finding files: {str(e)}"}
     
+    def _scan_directory(self, path: str, include_hidden: bool,
+                        pattern: Optional[re.Pattern]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        List and classify the entries of a directory (blocking).
+        
+        Args:
+            path: Absolute directory path
+            include_hidden: Whether to include entries starting with '.'
+            pattern: Compiled pattern entry names must match, or None
+            
+        Returns:
+            Tuple of (directories, files)
+        """
+        files = []
+        directories = []
+        
+        for entry in os.listdir(path):
+            # Skip hidden files if not requested
+            if not include_hidden and entry.startswith('.'):
+                continue
+            
+            # Check pattern if provided
+            if pattern and not pattern.search(entry):
+                continue
+            
+            full_path = os.path.join(path, entry)
+            
+            if os.path.isdir(full_path):
+                directories.append({
+                    "name": entry,
+                    "type": "directory",
+                    "path": full_path
+                })
+            else:
+                size = os.path.getsize(full_path)
+                files.append({
+                    "name": entry,
+                    "type": "file",
+                    "path": full_path,
+                    "size_bytes": size
+                })
+        
+        return directories, files
+    
+    def _walk_matches(self, path: str, pattern: re.Pattern, recursive: bool, max_depth: int) -> List[Dict[str, Any]]:
+        """
+        Find files under a directory whose names match a pattern (blocking).
+        
+        Args:
+            path: Absolute root directory
+            pattern: Compiled pattern file names must match
+            recursive: Whether to search subdirectories
+            max_depth: Maximum directory depth to search (0 for unlimited)
+            
+        Returns:
+            List of matching file entries
+        """
+        matches = []
+        
+        for root, dirs, files in os.walk(path):
+            # Check depth limit
+            if max_depth > 0:
+                relative_path = os.path.relpath(root, path)
+                depth = 0 if relative_path == '.' else relative_path.count(os.sep) + 1
+                if depth >= max_depth:
+                    dirs.clear()  # Don't descend further
+            
+            # Process files in this directory
+            for filename in files:
+                if pattern.search(filename):
+                    file_path = os.path.join(root, filename)
+                    try:
+                        size = os.path.getsize(file_path)
+                        matches.append({
+                            "name": filename,
+                            "path": file_path,
+                            "size_bytes": size
+                        })
+                    except:
+                        # Skip if we can't get file info
+                        pass
+            
+            # If not recursive, break after first iteration
+            if not recursive:
+                break
+        
+        return matches
+    
     async def _handle_generate_diff(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle generate_diff tool.
@@ -6,6 +6,44 @@ import asyncio
 import re
 from typing import Dict, List, Optional, Any, Tuple, Callable
 
+# Patterns that select a tool chain, checked in order. Each chain's
+# alternatives are joined into a single regex compiled once at import.
+_CHAIN_TYPE_PATTERNS = tuple(
+    (re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE), chain_type)
+    for patterns, chain_type in [
+        # File modification patterns
+        ([
+            r'modify\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
+            r'change\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
+            r'update\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
+            r'edit\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
+            r'code:change:(.+)'
+        ], "file_modification"),
+        # Code analysis patterns
+        ([
+            r'analyze\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
+            r'review\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
+            r'examine\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
+            r'code:analyze:(.+)'
+        ], "code_analysis"),
+        # Directory navigation patterns
+        ([
+            r'(?:go|navigate|change)\s+to\s+directory\s+([^\s,]+)',
+            r'set\s+working\s+directory\s+to\s+([^\s,]+)',
+            r'change\s+(?:the\s+)?directory\s+to\s+([^\s,]+)',
+            r'cd\s+([^\s,]+)',
+            r'code:workdir:(.+)'
+        ], "directory_navigation"),
+        # File search and read patterns
+        ([
+            r'find\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)',
+            r'search\s+for\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)',
+            r'locate\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)'
+        ], "file_search_and_read"),
+    ]
+)
+
+
 class ToolChainManager:
     """
     Manages the automatic chaining of tools to accomplish complex tasks.
@@ -75,49 +113,9 @@ class ToolChainManager:
         Returns:
             Chain type identifier or None if no chain matches
         """
-        # File modification patterns
-        file_mod_patterns = [
-            r'modify\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
-            r'change\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
-            r'update\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
-            r'edit\s+(?:the\s+)?(?:code|file)\s+(?:in|of)\s+([^\s,]+)',
-            r'code:change:(.+)'
-        ]
-        
-        # Code analysis patterns
-        code_analysis_patterns = [
-            r'analyze\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
-            r'review\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
-            r'examine\s+(?:the\s+)?code\s+(?:in|of)\s+([^\s,]+)',
-            r'code:analyze:(.+)'
-        ]
-        
-        # Directory navigation patterns
-        dir_nav_patterns = [
-            r'(?:go|navigate|change)\s+to\s+directory\s+([^\s,]+)',
-            r'set\s+working\s+directory\s+to\s+([^\s,]+)',
-            r'change\s+(?:the\s+)?directory\s+to\s+([^\s,]+)',
-            r'cd\s+([^\s,]+)',
-            r'code:workdir:(.+)'
-        ]
-        
-        # File search and read patterns
-        file_search_patterns = [
-            r'find\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)',
-            r'search\s+for\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)',
-            r'locate\s+(?:and\s+)?(?:read|open|show)\s+([^\s,]+)'
-        ]
-        
-        # Check each pattern group
-        for patterns, chain_type in [
-            (file_mod_patterns, "file_modification"),
-            (code_analysis_patterns, "code_analysis"),
-            (dir_nav_patterns, "directory_navigation"),
-            (file_search_patterns, "file_search_and_read")
-        ]:
-            for pattern in patterns:
-                if re.search(pattern, message, re.IGNORECASE):
-                    return chain_type
+        for pattern, chain_type in _CHAIN_TYPE_PATTERNS:
+            if pattern.search(message):
+                return chain_type
                     
         return None
     
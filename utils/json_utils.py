@@ -0,0 +1,93 @@
+"""
+JSON helpers for the ETMSonnet Assistant.
+Uses orjson when it is installed and falls back to the standard library.
+"""
+
+import json
+from typing import Any
+
+# Try to import orjson for faster serialization
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def dumps_sorted(obj: Any) -> bytes:
+    """
+    Serialize an object to compact JSON bytes with sorted keys.
+    The output is stable for equal inputs, so it can be used for hashing.
+
+    Args:
+        obj: Object to serialize
+
+    Returns:
+        JSON encoded bytes
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """
+    Serialize an object to a JSON string.
+
+    Args:
+        obj: Object to serialize
+        pretty: Whether to indent the output by two spaces
+
+    Returns:
+        JSON encoded string
+    """
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option, default=str).decode("utf-8")
+
+    return json.dumps(obj, indent=2 if pretty else None, default=str)
+
+
+def loads(data: Any) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON text as str or bytes
+
+    Returns:
+        Parsed object
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+# First characters of the JSON documents tool inputs are expected to contain
+_JSON_OPENERS = ("{", "[", '"')
+
+
+def try_loads(text: str) -> Any:
+    """
+    Parse text that may or may not be a JSON document.
+    Text that cannot start a JSON object, array or string is rejected without
+    calling the decoder, so free-form input never pays for a decode error.
+
+    Args:
+        text: Text to parse
+
+    Returns:
+        Parsed object, or None if the text is not valid JSON
+    """
+    if text.lstrip()[:1] not in _JSON_OPENERS:
+        return None
+
+    try:
+        return loads(text)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,34 @@
+"""
+Logging setup for the ETMSonnet Assistant.
+Log records are queued and written to stderr by a background thread,
+so logging an error never blocks the event loop.
+"""
+
+import sys
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+
+def setup_logging(level: int = logging.WARNING) -> QueueListener:
+    """
+    Route all log records through a queue to a stderr handler on a background thread.
+
+    Args:
+        level: Minimum level for the root logger
+
+    Returns:
+        The started listener; call stop() on shutdown to flush pending records
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [QueueHandler(log_queue)]
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
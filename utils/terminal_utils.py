@@ -120,6 +120,12 @@ def create_stream_callback(delay: float = 0.01) -> Callable[[str], None]:
         Callback function for streaming
     """
     def callback(chunk: str) -> None:
+        # Without a typing effect the whole chunk is written at once
+        if delay <= 0:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+            return
+
         for char in chunk:
             sys.stdout.write(char)
             sys.stdout.flush()